@@ -0,0 +1,341 @@
+"""
+Asyncio Dataverse client
+Same operations as dataverse_client, driven by an event loop over one shared
+HTTP connection pool instead of blocking requests calls.
+
+Batches are sent concurrently, bounded by DATAVERSE_MAX_CONCURRENCY. If any
+batch raises (network error, cancellation) the remaining batches are
+cancelled before the error propagates.
+"""
+
+import asyncio
+import httpx
+from dataverse_client import (
+    get_dataverse_token,
+    load_records,
+    build_upload_batch_body,
+    build_delete_batch_body,
+    encode_batch_body,
+    compression_rejected,
+    batch_succeeded,
+    PageScanner,
+    STREAM_CHUNK_SIZE,
+    DELETE_BATCH_SIZE
+)
+from dataverse_metadata import get_entity_metadata, get_primary_key_field, validate_records
+from config import (
+    DATAVERSE_URL,
+    TABLE_PREFIX,
+    TABLE_NAME,
+    BATCH_SIZE,
+    DATAVERSE_MAX_CONCURRENCY,
+    VALIDATE_RECORDS
+)
+from logger import get_logger, SAMPLED
+from rate_limiter import acquire_async, send_throttled_async
+
+
+# Batches can take minutes server-side, so only bound the connect phase tightly
+HTTP_TIMEOUT = httpx.Timeout(300.0, connect=30.0)
+
+
+async def _run_blocking(func, *args):
+    """Run a blocking function on the default executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, func, *args)
+
+
+async def get_dataverse_token_async():
+    """Authenticate to Dataverse without blocking the event loop"""
+    return await _run_blocking(get_dataverse_token)
+
+
+def _open_client(token):
+    """Create an HTTP client with Dataverse auth headers and a bounded pool"""
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "OData-MaxVersion": "4.0",
+        "OData-Version": "4.0",
+        "Accept": "application/json"
+    }
+    limits = httpx.Limits(max_connections=DATAVERSE_MAX_CONCURRENCY,
+                          max_keepalive_connections=DATAVERSE_MAX_CONCURRENCY)
+    return httpx.AsyncClient(headers=headers, limits=limits, timeout=HTTP_TIMEOUT)
+
+
+async def query_records(client, url):
+    """
+    Follow @odata.nextLink and yield each record, parsing pages as they stream in
+
+    Args:
+        client: httpx.AsyncClient from _open_client()
+        url: Full query URL for the first page (ids, dates and numbers only;
+            see dataverse_client.PageScanner)
+    """
+    logger = get_logger()
+
+    count = 0
+    while url:
+        scanner = PageScanner()
+        response = await send_throttled_async(lambda: client.send(client.build_request("GET", url), stream=True))
+        try:
+            if response.status_code != 200:
+                await response.aread()
+                raise RuntimeError(f"Error fetching records: {response.status_code} - {response.text[:500]}")
+
+            async for chunk in response.aiter_bytes(STREAM_CHUNK_SIZE):
+                for record in scanner.feed(chunk):
+                    count += 1
+                    yield record
+        finally:
+            await response.aclose()
+
+        url = scanner.next_link
+        logger.info("  Fetched %d records so far...", count, extra=SAMPLED)
+
+
+async def _fetch_record_ids(client, table_name, primary_key_field, filter_expression):
+    """Fetch the primary keys of every record matching an OData filter"""
+    url = (f"{DATAVERSE_URL}/api/data/v9.2/{table_name}"
+           f"?$filter={filter_expression}&$select={primary_key_field}")
+
+    return [record[primary_key_field] async for record in query_records(client, url)]
+
+
+async def _send_batches(client, bodies, label):
+    """
+    Post $batch bodies concurrently
+
+    Args:
+        client: httpx.AsyncClient from _open_client()
+        bodies: List of (batch_id, batch_body, record_count) tuples
+        label: Verb for log lines ("Uploaded", "Deleted")
+
+    Returns:
+        Number of records in batches that returned 2xx
+    """
+    logger = get_logger()
+    semaphore = asyncio.Semaphore(DATAVERSE_MAX_CONCURRENCY)
+    url = f"{DATAVERSE_URL}/api/data/v9.2/$batch"
+    total_records = sum(count for _, _, count in bodies)
+    done_count = 0
+
+    async def send(batch_number, batch_id, batch_body, record_count):
+        nonlocal done_count
+        headers = {"Content-Type": f"multipart/mixed; boundary=batch_{batch_id}"}
+        data, extra_headers = encode_batch_body(batch_body)
+
+        async def post():
+            async with semaphore:
+                response = await client.post(url, headers={**headers, **extra_headers}, content=data)
+                if extra_headers and compression_rejected(response.status_code):
+                    await acquire_async()
+                    response = await client.post(url, headers=headers, content=batch_body.encode("utf-8"))
+            return response
+
+        response = await send_throttled_async(post)
+
+        if batch_succeeded(response):
+            done_count += record_count
+            logger.info("  %s batch %d: %d records (Total: %d/%d)",
+                        label, batch_number, record_count, done_count, total_records, extra=SAMPLED)
+        else:
+            logger.error(f"  Error in batch {batch_number}: {response.status_code} - {response.text[:500]}")
+
+    tasks = [asyncio.create_task(send(number, *body)) for number, body in enumerate(bodies, 1)]
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # Cooperative cancellation: stop the remaining batches if one failed
+        # or if we were cancelled ourselves
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    return done_count
+
+
+async def upload_to_dataverse_async(csv_file_path, start_date=None, end_date=None,
+                                    table_name=None, table_prefix=None, token=None):
+    """
+    Read CSV and upload data to Dataverse with concurrent batch requests
+
+    Args:
+        csv_file_path: Path to the CSV file
+        start_date: Optional start date (YYYY-MM-DD) to filter records
+        end_date: Optional end date (YYYY-MM-DD) to filter records
+        table_name: Target table (default: TABLE_NAME from config)
+        table_prefix: Column prefix (default: TABLE_PREFIX from config)
+        token: Optional access token to reuse instead of authenticating
+
+    Returns:
+        True if every batch was accepted
+    """
+    logger = get_logger()
+
+    if table_name is None:
+        table_name = TABLE_NAME
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
+
+    logger.info("=== Uploading to Dataverse (async) ===")
+
+    if token is None:
+        logger.info("Authenticating to Dataverse...")
+        token = await get_dataverse_token_async()
+
+    records = await _run_blocking(load_records, csv_file_path, start_date, end_date, table_prefix)
+
+    loaded_records = len(records)
+    if VALIDATE_RECORDS:
+        metadata = await _run_blocking(get_entity_metadata, token, table_name)
+        records = validate_records(records, metadata)
+    skipped_records = loaded_records - len(records)
+
+    total_records = len(records)
+    logger.info(f"Found {total_records} records to upload")
+
+    if total_records == 0:
+        logger.warning("No records to upload")
+        return skipped_records == 0
+
+    bodies = []
+    for i in range(0, total_records, BATCH_SIZE):
+        batch = records[i:i + BATCH_SIZE]
+        bodies.append((*build_upload_batch_body(batch, table_name), len(batch)))
+
+    async with _open_client(token) as client:
+        row_count = await _send_batches(client, bodies, "Uploaded")
+
+    logger.info(f"✓ Successfully uploaded {row_count} rows to Dataverse table '{table_name}'")
+    if skipped_records:
+        logger.warning(f"{skipped_records} rows were skipped by validation and not uploaded")
+
+    return row_count == total_records and skipped_records == 0
+
+
+async def _delete_matching(client, table_name, primary_key_field, filter_expression):
+    """Delete every record matching an OData filter; returns (found, deleted)"""
+    logger = get_logger()
+
+    record_ids = await _fetch_record_ids(client, table_name, primary_key_field, filter_expression)
+    total_records = len(record_ids)
+    logger.info(f"Total records fetched: {total_records}")
+
+    if total_records == 0:
+        return 0, 0
+
+    bodies = []
+    for i in range(0, total_records, DELETE_BATCH_SIZE):
+        batch_ids = record_ids[i:i + DELETE_BATCH_SIZE]
+        bodies.append((*build_delete_batch_body(batch_ids, table_name), len(batch_ids)))
+
+    deleted_count = await _send_batches(client, bodies, "Deleted")
+    return total_records, deleted_count
+
+
+async def delete_records_in_date_range_async(start_date, end_date, date_field_name=None,
+                                             table_name=None, table_prefix=None, token=None):
+    """
+    Delete all records where the date is within the specified range
+
+    Args:
+        start_date: Start date in format 'YYYY-MM-DD'
+        end_date: End date in format 'YYYY-MM-DD'
+        date_field_name: Name of the date field to filter on (default: cr834_date)
+        table_name: Target table (default: TABLE_NAME from config)
+        table_prefix: Column prefix (default: TABLE_PREFIX from config)
+        token: Optional access token to reuse instead of authenticating
+
+    Returns:
+        True if every matching record was deleted
+    """
+    logger = get_logger()
+
+    if table_name is None:
+        table_name = TABLE_NAME
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
+    if date_field_name is None:
+        date_field_name = f"{table_prefix}_date"
+
+    logger.info(f"=== Deleting Records Between {start_date} and {end_date} (async) ===")
+
+    if token is None:
+        logger.info("Authenticating to Dataverse...")
+        token = await get_dataverse_token_async()
+
+    primary_key_field = await _run_blocking(get_primary_key_field, token, table_name)
+    filter_expression = f"{date_field_name} ge '{start_date}' and {date_field_name} le '{end_date}'"
+
+    try:
+        async with _open_client(token) as client:
+            total_records, deleted_count = await _delete_matching(
+                client, table_name, primary_key_field, filter_expression)
+    except RuntimeError as e:
+        logger.error(str(e))
+        return False
+
+    if total_records == 0:
+        logger.info(f"No records found in date range {start_date} to {end_date}")
+        return True
+
+    logger.info(f"✓ Successfully deleted {deleted_count} records from table '{table_name}'")
+    return deleted_count == total_records
+
+
+async def delete_records_after_date_async(date_string, date_field_name=None, token=None):
+    """
+    Delete all records where the date is after the specified date
+
+    Args:
+        date_string: Date in format 'YYYY-MM-DD' (e.g., '2024-01-01')
+        date_field_name: Name of the date field to filter on (default: cr834_date)
+        token: Optional access token to reuse instead of authenticating
+    """
+    logger = get_logger()
+
+    if date_field_name is None:
+        date_field_name = f"{TABLE_PREFIX}_date"
+
+    logger.info(f"=== Deleting Records After {date_string} (async) ===")
+
+    if token is None:
+        logger.info("Authenticating to Dataverse...")
+        token = await get_dataverse_token_async()
+
+    primary_key_field = await _run_blocking(get_primary_key_field, token, TABLE_NAME)
+    filter_expression = f"{date_field_name} gt '{date_string}'"
+
+    async with _open_client(token) as client:
+        total_records, deleted_count = await _delete_matching(
+            client, TABLE_NAME, primary_key_field, filter_expression)
+
+    if total_records == 0:
+        logger.info(f"No records found with {date_field_name} after {date_string}")
+        return
+
+    logger.info(f"✓ Successfully deleted {deleted_count} records from table '{TABLE_NAME}'")
+
+
+async def sync_date_range_async(csv_file_path, start_date, end_date,
+                                table_name=None, table_prefix=None):
+    """
+    Delete then re-upload a date range with one token
+
+    The upload is skipped if the delete failed, so rows that were not
+    deleted are never uploaded a second time.
+
+    Returns:
+        True if the delete and the upload both succeeded
+    """
+    logger = get_logger()
+
+    token = await get_dataverse_token_async()
+    if not await delete_records_in_date_range_async(start_date, end_date, table_name=table_name,
+                                                    table_prefix=table_prefix, token=token):
+        logger.error("One or more delete batches failed; skipping the upload")
+        return False
+    return await upload_to_dataverse_async(csv_file_path, start_date=start_date, end_date=end_date,
+                                           table_name=table_name, table_prefix=table_prefix, token=token)
@@ -0,0 +1,373 @@
+"""
+Offline micro-benchmarks for the per-row transform path
+
+Measures rows/sec and peak allocated memory for each stage a report row
+goes through before upload, on a synthetic Unanet export:
+
+    read_csv             csv.DictReader over the file
+    map_rows             map_csv_row_to_dataverse()
+    convert_to_decimal   convert_to_decimal() on the six amount columns
+    parse_date           parse_date() on the Date column
+    filter_by_date       filter_records_by_date() over mapped records
+    build_batch_body     build_upload_batch_body() in BATCH_SIZE chunks
+    iter_csv_records     read + filter + map end to end
+
+No Dataverse or Unanet access is needed.
+
+Usage:
+    python benchmark.py generate [--rows N] [--output FILE]   Write a synthetic report CSV
+    python benchmark.py run [--rows N] [--save-baseline]       Run the benchmarks
+    python benchmark.py compare [--threshold 0.15]             Run and compare with the baseline
+
+compare exits with status 1 if any stage is slower, or allocates more, than
+the baseline by more than the threshold. Baselines are machine-specific;
+record one with run --save-baseline on the machine that does the comparing.
+"""
+
+import argparse
+import csv
+import gc
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from dataverse_client import (
+    CSV_COLUMNS,
+    DECIMAL_COLUMNS,
+    map_csv_row_to_dataverse,
+    convert_to_decimal,
+    parse_date,
+    filter_records_by_date,
+    iter_csv_records,
+    build_upload_batch_body
+)
+from config import PROJECT_DIR, BATCH_SIZE
+from logger import setup_logger, get_logger
+
+
+BASELINE_FILE = PROJECT_DIR / "benchmarks" / "baseline.json"
+
+DEFAULT_ROWS = 100000
+DEFAULT_REPEAT = 5
+# Allowed slowdown / extra memory before a stage counts as a regression
+DEFAULT_THRESHOLD = 0.15
+# Stages that allocate next to nothing would flag on a few KB; ignore growth below this
+MIN_ALLOCATION_CHANGE = 64 * 1024
+
+# Same seed and size -> same file, so runs are comparable
+SEED = 20250530
+BENCH_PREFIX = "cr834"
+BENCH_TABLE = "benchmarkrows"
+
+
+def generate_report(path, rows=DEFAULT_ROWS, seed=SEED):
+    """
+    Write a synthetic Unanet export with the report's 21 columns
+
+    Cardinalities are close to a real report: a few hundred projects and
+    people, two years of dates, some blank amounts and posting dates, and
+    text with commas and quotes.
+    """
+    rng = random.Random(seed)
+
+    organizations = [f"AZT-{name}" for name in ("Federal", "Commercial", "State", "Internal", "Research")]
+    projects = [f"{rng.choice(['FED', 'COM', 'ST'])}-{number:05d}" for number in range(250)]
+    people = [f"{rng.choice(['Smith', 'Garcia', 'Nguyen', 'Patel', 'Jones'])}, Person {number}" for number in range(300)]
+    categories = ["Engineer I", "Engineer II", "Senior Engineer", "Analyst", "Project Manager", "SME, Level 3"]
+    locations = ["Remote", "Phoenix, AZ", "Client Site", "Tucson, AZ"]
+    project_types = ["T&M", "FFP", "CPFF", "Overhead"]
+    pay_codes = ["REG", "OT", "HOL", "PTO"]
+    tasks = ["Development", "Testing", "Program \"Support\"", "Design, Architecture", "Training"]
+
+    first_day = datetime(2024, 1, 1)
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for number in range(rows):
+            day = first_day + timedelta(days=rng.randrange(730))
+            posted = day + timedelta(days=rng.randrange(1, 20))
+            date = f"{day.month}/{day.day}/{day.year}"
+            hours = round(rng.uniform(0.25, 10), 2)
+            rate = rng.choice([95.0, 125.5, 150.0, 185.25])
+            amount = f"{hours * rate:.2f}"
+            billable = amount if rng.random() > 0.1 else ""
+
+            writer.writerow([
+                rng.choice(organizations),
+                rng.choice(projects),
+                str(rng.randrange(1, 40)),
+                rng.choice(tasks),
+                rng.choice(categories),
+                rng.choice(locations),
+                rng.choice(project_types),
+                rng.choice(pay_codes),
+                rng.choice(people),
+                f"TS-{number:08d}",
+                date,
+                f"{posted.month}/{posted.day}/{posted.year}" if rng.random() > 0.05 else "",
+                f"{posted.month}/{posted.day}/{posted.year}" if rng.random() > 0.3 else "",
+                "USD",
+                f"{rate:.2f}",
+                f"{hours:.2f}",
+                amount,
+                billable,
+                "USD",
+                amount,
+                billable
+            ])
+
+    return path
+
+
+def _stages(csv_path):
+    """
+    (name, setup, run) for each stage
+
+    setup() returns the input for run(input), which returns the number of
+    rows it processed. Setup is not timed.
+    """
+    def load_rows():
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            return list(csv.DictReader(f))
+
+    def load_records():
+        return [map_csv_row_to_dataverse(row, BENCH_PREFIX) for row in load_rows()]
+
+    def read_csv(_):
+        with open(csv_path, 'r', encoding='utf-8') as f:
+            return sum(1 for _ in csv.DictReader(f))
+
+    def map_rows(rows):
+        for row in rows:
+            map_csv_row_to_dataverse(row, BENCH_PREFIX)
+        return len(rows)
+
+    def decimals_setup():
+        columns = [column for column in CSV_COLUMNS if column in DECIMAL_COLUMNS]
+        rows = load_rows()
+        return len(rows), [row[column] for row in rows for column in columns]
+
+    def decimals(data):
+        row_count, values = data
+        for value in values:
+            convert_to_decimal(value)
+        return row_count
+
+    def dates(values):
+        for value in values:
+            parse_date(value)
+        return len(values)
+
+    def filter_by_date(records):
+        filter_records_by_date(records, "2024-07-01", "2025-06-30", BENCH_PREFIX)
+        return len(records)
+
+    def batch_bodies(records):
+        for i in range(0, len(records), BATCH_SIZE):
+            build_upload_batch_body(records[i:i + BATCH_SIZE], BENCH_TABLE)
+        return len(records)
+
+    def end_to_end(_):
+        return sum(1 for _ in iter_csv_records(csv_path, BENCH_PREFIX, "2024-07-01", "2025-06-30"))
+
+    return [
+        ("read_csv", lambda: None, read_csv),
+        ("map_rows", load_rows, map_rows),
+        ("convert_to_decimal", decimals_setup, decimals),
+        ("parse_date", lambda: [row["Date"] for row in load_rows()], dates),
+        ("filter_by_date", load_records, filter_by_date),
+        ("build_batch_body", load_records, batch_bodies),
+        ("iter_csv_records", lambda: None, end_to_end),
+    ]
+
+
+def _time_stage(setup, run, repeat):
+    """Best-of-repeat wall time; the best run is the least disturbed by other load"""
+    data = setup()
+    best = None
+    rows = 0
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        rows = run(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return rows, best
+
+
+def _measure_allocations(setup, run):
+    """Peak memory allocated by one run of a stage (traced separately from timing)"""
+    data = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        run(data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return max(0, peak - before)
+
+
+def run_benchmarks(csv_path, repeat=DEFAULT_REPEAT):
+    """
+    Run every stage on a report CSV
+
+    Returns:
+        Results dict (see BASELINE_FILE) with rows_per_sec and peak_bytes per stage
+    """
+    logger = get_logger()
+
+    results = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}",
+        "csv": str(csv_path),
+        "stages": {}
+    }
+
+    for name, setup, run in _stages(csv_path):
+        rows, elapsed = _time_stage(setup, run, repeat)
+        peak = _measure_allocations(setup, run)
+        results["stages"][name] = {
+            "rows": rows,
+            "seconds": round(elapsed, 4),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+            "peak_bytes": peak
+        }
+        logger.info(f"  {name:<20} {rows / elapsed:>12,.0f} rows/s   "
+                    f"peak {peak / 1e6:>8.1f} MB ({peak / max(rows, 1):,.0f} B/row)")
+
+    results["rows"] = results["stages"]["read_csv"]["rows"]
+    return results
+
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    Stages that got slower or allocate more than the threshold allows
+
+    Returns:
+        List of human-readable regression descriptions
+    """
+    regressions = []
+    for name, stage in current["stages"].items():
+        base = baseline.get("stages", {}).get(name)
+        if base is None:
+            continue
+
+        if base.get("rows_per_sec") and stage["rows_per_sec"] < base["rows_per_sec"] * (1 - threshold):
+            change = stage["rows_per_sec"] / base["rows_per_sec"] - 1
+            regressions.append(f"{name}: {stage['rows_per_sec']:,.0f} rows/s vs "
+                               f"{base['rows_per_sec']:,.0f} baseline ({change:+.0%})")
+
+        if (base.get("peak_bytes") and stage["peak_bytes"] > base["peak_bytes"] * (1 + threshold)
+                and stage["peak_bytes"] - base["peak_bytes"] > MIN_ALLOCATION_CHANGE):
+            change = stage["peak_bytes"] / base["peak_bytes"] - 1
+            regressions.append(f"{name}: peak {stage['peak_bytes'] / 1e6:.1f} MB vs "
+                               f"{base['peak_bytes'] / 1e6:.1f} MB baseline ({change:+.0%})")
+
+    return regressions
+
+
+def _report_path(args, work_dir):
+    """CSV to benchmark: --csv, or a synthetic report of --rows rows"""
+    if args.csv:
+        return Path(args.csv)
+
+    path = Path(work_dir) / f"synthetic_{args.rows}.csv"
+    get_logger().info(f"Generating synthetic report with {args.rows:,} rows...")
+    return generate_report(path, args.rows)
+
+
+def cmd_generate(args):
+    output = Path(args.output or f"synthetic_report_{args.rows}.csv")
+    generate_report(output, args.rows)
+    get_logger().info(f"Wrote {args.rows:,} rows to {output}")
+
+
+def cmd_run(args):
+    logger = get_logger()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        csv_path = _report_path(args, work_dir)
+        logger.info(f"=== Benchmarking transform stages ({args.repeat} repeats, best run) ===")
+        results = run_benchmarks(csv_path, args.repeat)
+
+    if args.save_baseline:
+        baseline_file = Path(args.baseline)
+        baseline_file.parent.mkdir(parents=True, exist_ok=True)
+        baseline_file.write_text(json.dumps(results, indent=2), encoding='utf-8')
+        logger.info(f"Baseline saved to {baseline_file}")
+    return results
+
+
+def cmd_compare(args):
+    logger = get_logger()
+
+    baseline_file = Path(args.baseline)
+    if not baseline_file.exists():
+        logger.error(f"No baseline at {baseline_file}; record one with: python benchmark.py run --save-baseline")
+        return 2
+    baseline = json.loads(baseline_file.read_text(encoding='utf-8'))
+
+    # Same size as the baseline unless told otherwise
+    if args.rows is None:
+        args.rows = baseline.get("rows", DEFAULT_ROWS)
+    args.save_baseline = False
+    current = cmd_run(args)
+
+    regressions = compare_results(baseline, current, args.threshold)
+    if regressions:
+        logger.error(f"{len(regressions)} regressions beyond {args.threshold:.0%} "
+                     f"(baseline from {baseline.get('created')}):")
+        for regression in regressions:
+            logger.error(f"  {regression}")
+        return 1
+
+    logger.info(f"✓ No stage regressed beyond {args.threshold:.0%} of the baseline from {baseline.get('created')}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the report transform path")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    generate = subparsers.add_parser("generate", help="Write a synthetic report CSV")
+    generate.add_argument("--rows", type=int, default=DEFAULT_ROWS, help=f"Rows (default: {DEFAULT_ROWS})")
+    generate.add_argument("--output", help="Output file (default: synthetic_report_<rows>.csv)")
+    generate.set_defaults(handler=cmd_generate)
+
+    for name, help_text in (("run", "Run the benchmarks"), ("compare", "Run and compare with the baseline")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--csv", help="Benchmark this report instead of a synthetic one")
+        sub.add_argument("--rows", type=int, default=DEFAULT_ROWS if name == "run" else None,
+                         help="Rows of synthetic data (default: %s)" % (DEFAULT_ROWS if name == "run" else "as baseline"))
+        sub.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                         help=f"Timed runs per stage, best is kept (default: {DEFAULT_REPEAT})")
+        sub.add_argument("--baseline", default=str(BASELINE_FILE), help=f"Baseline file (default: {BASELINE_FILE})")
+        if name == "run":
+            sub.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline")
+            sub.set_defaults(handler=cmd_run)
+        else:
+            sub.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                             help=f"Allowed slowdown / extra memory as a fraction (default: {DEFAULT_THRESHOLD})")
+            sub.set_defaults(handler=cmd_compare)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    setup_logger()
+    result = args.handler(args)
+    return result if isinstance(result, int) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,274 @@
+"""
+Single command-line entry point for Unanet to Dataverse Integration
+
+Usage:
+    python cli.py sync                              Full download + sync (same as main.py)
+    python cli.py upload [CSV] [--start D --end D]  Upload a report (default: today's)
+    python cli.py delete DATE [--yes]               Delete records with date > DATE
+    python cli.py delete --start D --end D [--yes]  Delete records in a date range
+    python cli.py count DATE                        Count records with date > DATE
+    python cli.py count --start D --end D           Count records in a date range
+    python cli.py sample [CSV] [-n 10]              Upload a few records one by one
+    python cli.py daemon [--no-initial-run]         Stay resident and sync on a schedule
+    python cli.py shard-plan [CSV] [--start D --end D] [--days N]
+                                                    Split the sync window into shards
+    python cli.py shard-worker [--worker-id ID]     Claim and sync shards until none are left
+    python cli.py shard-status                      Show the shard lease table
+    python cli.py verify [CSV] [--start D --end D] [--no-resync]
+                                                    Compare Dataverse with a report
+    python cli.py --profile COMMAND ...             Profile a command (output in logs/profile_*/)
+
+Heavy dependencies (Playwright, MSAL, requests, pyarrow) are only imported by
+the subcommand that needs them. Startup time is logged at the start of
+every command.
+"""
+
+import time
+
+_START = time.perf_counter()
+
+import argparse
+import sys
+from datetime import datetime
+
+
+def _today_report():
+    """Path of today's downloaded report"""
+    from config import DOWNLOAD_DIR
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    return DOWNLOAD_DIR / f"unanet_report_{today}.csv"
+
+
+def _report_startup(logger, handler_start):
+    """Log how long startup and the subcommand's imports took"""
+    now = time.perf_counter()
+    logger.info(f"Startup: {(now - _START) * 1000:.0f} ms "
+                f"(subcommand imports: {(now - handler_start) * 1000:.0f} ms)")
+
+
+def cmd_sync(args, logger, handler_start):
+    """Download the report and sync it (main.py workflow)"""
+    from main import main as run_sync
+
+    _report_startup(logger, handler_start)
+    run_sync(setup_logging=False, profile=args.profile)
+
+
+def cmd_upload(args, logger, handler_start):
+    """Upload a CSV, optionally limited to a date range"""
+    from dataverse_client import upload_to_dataverse
+
+    _report_startup(logger, handler_start)
+    csv_path = args.csv or _today_report()
+    upload_to_dataverse(csv_path, start_date=args.start, end_date=args.end)
+
+
+def cmd_delete(args, logger, handler_start):
+    """Delete records after a date or in a date range, after confirmation"""
+    from dataverse_client import get_dataverse_token, delete_records_after_date, delete_records_in_date_range
+    from dataverse_planning import plan_delete, log_plan
+
+    _report_startup(logger, handler_start)
+
+    # One sign-in shared by the plan and the delete
+    token = get_dataverse_token()
+    if args.start and args.end:
+        log_plan(plan_delete(start_date=args.start, end_date=args.end, token=token))
+        description = f"{args.start} <= date <= {args.end}"
+    else:
+        log_plan(plan_delete(after_date=args.date, token=token))
+        description = f"date > {args.date}"
+
+    if not args.yes:
+        logger.warning(f"WARNING: This will delete ALL records with {description}")
+        response = input("Are you sure you want to continue? (yes/no): ")
+        if response.lower() != 'yes':
+            logger.info("Deletion cancelled")
+            return
+
+    if args.start and args.end:
+        delete_records_in_date_range(args.start, args.end, token=token)
+    else:
+        delete_records_after_date(args.date, token=token)
+
+
+def cmd_count(args, logger, handler_start):
+    """Count matching records and estimate the cost of deleting them"""
+    from dataverse_planning import plan_delete, log_plan
+
+    _report_startup(logger, handler_start)
+    if args.start and args.end:
+        log_plan(plan_delete(start_date=args.start, end_date=args.end))
+    else:
+        log_plan(plan_delete(after_date=args.date))
+
+
+def cmd_sample(args, logger, handler_start):
+    """Upload a few records individually for testing"""
+    from upload_sample import upload_sample_records
+
+    _report_startup(logger, handler_start)
+    upload_sample_records(args.csv or _today_report(), args.num_records)
+
+
+def cmd_daemon(args, logger, handler_start):
+    """Run the sync daemon until interrupted"""
+    from sync_daemon import run_daemon
+
+    _report_startup(logger, handler_start)
+    run_daemon(setup_logging=False, run_at_start=not args.no_initial_run)
+
+
+def cmd_shard_plan(args, logger, handler_start):
+    """Split the sync window into shards for shard workers"""
+    from datetime import timedelta
+    from shard_sync import plan_shards, log_status
+
+    _report_startup(logger, handler_start)
+
+    today = datetime.now()
+    start_date = args.start or (today - timedelta(days=365)).strftime("%Y-%m-%d")
+    end_date = args.end or today.strftime("%Y-%m-%d")
+
+    if args.csv:
+        csv_path = args.csv
+    else:
+        from unanet_downloader import download_report
+
+        csv_path = download_report(start_date=start_date, end_date=end_date)
+
+    plan_shards(csv_path, start_date, end_date, shard_days=args.days)
+    log_status()
+
+
+def cmd_shard_worker(args, logger, handler_start):
+    """Claim and sync shards until none are left"""
+    from shard_sync import run_worker
+
+    _report_startup(logger, handler_start)
+    if run_worker(worker_id=args.worker_id):
+        return 1
+
+
+def cmd_shard_status(args, logger, handler_start):
+    """Show every shard and its lease"""
+    from shard_sync import log_status
+
+    _report_startup(logger, handler_start)
+    log_status()
+
+
+def cmd_verify(args, logger, handler_start):
+    """Compare per-partition counts and sums with Dataverse"""
+    from datetime import timedelta
+    from reconcile import verify_sync
+
+    _report_startup(logger, handler_start)
+
+    today = datetime.now()
+    start_date = args.start or (today - timedelta(days=365)).strftime("%Y-%m-%d")
+    end_date = args.end or today.strftime("%Y-%m-%d")
+
+    remaining = verify_sync(args.csv or _today_report(), start_date, end_date,
+                            partition=args.partition, resync=False if args.no_resync else None)
+    if remaining:
+        return 1
+
+
+def build_parser():
+    """Build the argument parser with one subparser per command"""
+    parser = argparse.ArgumentParser(description="Unanet to Dataverse Integration")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile the command (cProfile, stack samples, allocations) into logs/profile_*/")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync = subparsers.add_parser("sync", help="Download the Unanet report and sync it to Dataverse")
+    sync.set_defaults(handler=cmd_sync)
+
+    upload = subparsers.add_parser("upload", help="Upload a report CSV to Dataverse")
+    upload.add_argument("csv", nargs="?", help="CSV file (default: today's report)")
+    upload.add_argument("--start", help="Only upload records on or after this date (YYYY-MM-DD)")
+    upload.add_argument("--end", help="Only upload records on or before this date (YYYY-MM-DD)")
+    upload.set_defaults(handler=cmd_upload)
+
+    for name, handler, help_text in (
+        ("delete", cmd_delete, "Delete records from Dataverse"),
+        ("count", cmd_count, "Count records without fetching them"),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("date", nargs="?", help="Match records with date AFTER this date (YYYY-MM-DD)")
+        sub.add_argument("--start", help="Range start (YYYY-MM-DD), use with --end")
+        sub.add_argument("--end", help="Range end (YYYY-MM-DD), use with --start")
+        if name == "delete":
+            sub.add_argument("--yes", action="store_true", help="Skip the confirmation prompt")
+        sub.set_defaults(handler=handler)
+
+    sample = subparsers.add_parser("sample", help="Upload a few records one at a time")
+    sample.add_argument("csv", nargs="?", help="CSV file (default: today's report)")
+    sample.add_argument("-n", "--num-records", type=int, default=10, help="Number of records (default: 10)")
+    sample.set_defaults(handler=cmd_sample)
+
+    daemon = subparsers.add_parser("daemon", help="Stay resident and sync on a schedule or trigger")
+    daemon.add_argument("--no-initial-run", action="store_true",
+                        help="Wait for the schedule or a trigger instead of syncing at startup")
+    daemon.set_defaults(handler=cmd_daemon)
+
+    shard_plan = subparsers.add_parser("shard-plan", help="Split the sync window into shards for shard workers")
+    shard_plan.add_argument("csv", nargs="?", help="Report CSV on a path every worker can read (default: download today's)")
+    shard_plan.add_argument("--start", help="Window start (default: 365 days ago)")
+    shard_plan.add_argument("--end", help="Window end (default: today)")
+    shard_plan.add_argument("--days", type=int, help="Days per shard (default: SHARD_DAYS)")
+    shard_plan.set_defaults(handler=cmd_shard_plan)
+
+    shard_worker = subparsers.add_parser("shard-worker", help="Claim and sync shards until none are left")
+    shard_worker.add_argument("--worker-id", help="Name in the lease table (default: host:pid)")
+    shard_worker.set_defaults(handler=cmd_shard_worker)
+
+    shard_status = subparsers.add_parser("shard-status", help="Show the shard lease table")
+    shard_status.set_defaults(handler=cmd_shard_status)
+
+    verify = subparsers.add_parser("verify", help="Compare Dataverse with a report and re-sync what differs")
+    verify.add_argument("csv", nargs="?", help="CSV file (default: today's report)")
+    verify.add_argument("--start", help="Window start (default: 365 days ago)")
+    verify.add_argument("--end", help="Window end (default: today)")
+    verify.add_argument("--partition", choices=["day", "week", "month"],
+                        help="Compare per day, week or month (default: VERIFY_PARTITION)")
+    verify.add_argument("--no-resync", action="store_true", help="Only report differences")
+    verify.set_defaults(handler=cmd_verify)
+
+    return parser
+
+
+def main(argv=None):
+    """Parse arguments and run the chosen subcommand"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.command in ("delete", "count") and not args.date and not (args.start and args.end):
+        parser.error(f"{args.command} needs a DATE or both --start and --end")
+
+    if args.profile and args.command == "daemon":
+        parser.error("--profile is not supported for the daemon")
+
+    from logger import setup_logger
+
+    logger = setup_logger()
+    handler_start = time.perf_counter()
+
+    # sync profiles each of its own phases (download, sync, rollups, ...)
+    if not args.profile or args.command == "sync":
+        return args.handler(args, logger, handler_start)
+
+    from profiling import start_profiling, stop_profiling, profile_phase
+
+    start_profiling(args.command)
+    try:
+        with profile_phase(args.command):
+            return args.handler(args, logger, handler_start)
+    finally:
+        stop_profiling()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -20,6 +20,17 @@ UNANET_URL = os.getenv('UNANET_URL', 'h')
 UNANET_USERNAME = os.getenv('UNANET_USERNAME', '')
 UNANET_PASSWORD = os.getenv('UNANET_PASSWORD', '')
 UNANET_REPORT_ID = os.getenv('UNANET_REPORT_ID', '')
+UNANET_REPORT_TIMEOUT_SECONDS = int(os.getenv('UNANET_REPORT_TIMEOUT_SECONDS', '60'))
+
+# Split large exports into date slices downloaded concurrently (1 = one export)
+UNANET_DOWNLOAD_SLICES = int(os.getenv('UNANET_DOWNLOAD_SLICES', '1'))
+UNANET_DOWNLOAD_WORKERS = int(os.getenv('UNANET_DOWNLOAD_WORKERS', '4'))   # Browsers open at once
+# Report criteria form used to set each slice's dates
+UNANET_CRITERIA_SELECTOR = os.getenv('UNANET_CRITERIA_SELECTOR', 'tr#{report_id} td.icon a[href*="criteria"]')
+UNANET_BEGIN_DATE_SELECTOR = os.getenv('UNANET_BEGIN_DATE_SELECTOR', 'input[name="beginDate"]')
+UNANET_END_DATE_SELECTOR = os.getenv('UNANET_END_DATE_SELECTOR', 'input[name="endDate"]')
+UNANET_RUN_SELECTOR = os.getenv('UNANET_RUN_SELECTOR', '#button_run')
+UNANET_DATE_FORMAT = os.getenv('UNANET_DATE_FORMAT', '%m/%d/%Y')
 
 # === DATAVERSE/POWERAPPS CONFIG ===
 DATAVERSE_URL = os.getenv('DATAVERSE_URL', '')
@@ -31,6 +42,109 @@ TABLE_NAME = os.getenv('TABLE_NAME', '')
 # === FILE PATHS ===
 PROJECT_DIR = application_path
 DOWNLOAD_DIR = PROJECT_DIR / "reports"
+CACHE_DIR = PROJECT_DIR / "cache"
+
+# === LOGGING ===
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()          # 'text' or 'json' (file only)
+LOG_ROTATION = os.getenv('LOG_ROTATION', 'size').lower()      # 'size'/'time' (one file per command), or 'run'
+LOG_MAX_BYTES = int(os.getenv('LOG_MAX_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv('LOG_BACKUP_COUNT', '10'))
+LOG_ROTATE_WHEN = os.getenv('LOG_ROTATE_WHEN', 'midnight')
+# Per-batch progress lines: log every Nth, or at least one every N seconds (0 = off)
+LOG_SAMPLE_EVERY = int(os.getenv('LOG_SAMPLE_EVERY', '1'))
+LOG_SAMPLE_INTERVAL = float(os.getenv('LOG_SAMPLE_INTERVAL', '0'))
 
 # === BATCH SETTINGS ===
 BATCH_SIZE = int(os.getenv('BATCH_SIZE', '500'))
+
+# Typical wall-clock seconds per $batch request, used for pre-flight time estimates
+ESTIMATED_SECONDS_PER_BATCH = float(os.getenv('ESTIMATED_SECONDS_PER_BATCH', '20'))
+
+# === MULTI-JOB SETTINGS ===
+SYNC_JOBS_FILE = PROJECT_DIR / os.getenv('SYNC_JOBS_FILE', 'jobs.json')
+SYNC_MAX_WORKERS = int(os.getenv('SYNC_MAX_WORKERS', '3'))
+DATAVERSE_MAX_CONCURRENCY = int(os.getenv('DATAVERSE_MAX_CONCURRENCY', '4'))
+
+# === SYNC MODE ===
+# 'delete-upload': delete the whole window, then upload it
+# 'replace': swap the window one partition at a time (delete + insert in one changeset)
+SYNC_MODE = os.getenv('SYNC_MODE', 'delete-upload').lower()
+REPLACE_PARTITION = os.getenv('REPLACE_PARTITION', 'week').lower()
+
+# === METADATA / VALIDATION ===
+# Table metadata (primary key, column types, lengths) is cached on disk for this long
+METADATA_CACHE_DIR = CACHE_DIR
+METADATA_CACHE_TTL_HOURS = float(os.getenv('METADATA_CACHE_TTL_HOURS', '24'))
+# Validate and coerce records against the table metadata before uploading
+VALIDATE_RECORDS = os.getenv('VALIDATE_RECORDS', 'true').lower() in ('1', 'true', 'yes')
+
+# === REPORT ARCHIVE ===
+# Convert downloaded CSVs to month-partitioned Parquet and read uploads from it
+ARCHIVE_ENABLED = os.getenv('ARCHIVE_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+ARCHIVE_DIR = PROJECT_DIR / "archive"
+ARCHIVE_RETENTION_DAYS = int(os.getenv('ARCHIVE_RETENTION_DAYS', '90'))
+ARCHIVE_COMPRESSION = os.getenv('ARCHIVE_COMPRESSION', 'zstd')
+
+# === ROLLUPS ===
+# Optional summary table of hours/amounts by ROLLUP_GROUP_BY and month (empty = disabled)
+ROLLUP_TABLE_NAME = os.getenv('ROLLUP_TABLE_NAME', '')
+ROLLUP_TABLE_PREFIX = os.getenv('ROLLUP_TABLE_PREFIX', TABLE_PREFIX)
+ROLLUP_GROUP_BY = [c.strip() for c in os.getenv('ROLLUP_GROUP_BY', 'ProjectCode,Person').split(',') if c.strip()]
+
+# === CLIENT SETTINGS ===
+# Use the asyncio Dataverse client (concurrent batches) instead of the blocking one
+USE_ASYNC_CLIENT = os.getenv('USE_ASYNC_CLIENT', 'false').lower() in ('1', 'true', 'yes')
+
+# === SYNC DAEMON ===
+# Minutes between scheduled runs (0 = only run when the trigger file appears)
+DAEMON_INTERVAL_MINUTES = float(os.getenv('DAEMON_INTERVAL_MINUTES', '240'))
+# Creating this file starts a run; the daemon deletes it
+DAEMON_TRIGGER_FILE = PROJECT_DIR / os.getenv('DAEMON_TRIGGER_FILE', 'sync.trigger')
+# Local status endpoint (http://127.0.0.1:PORT/status, 0 = disabled)
+DAEMON_STATUS_PORT = int(os.getenv('DAEMON_STATUS_PORT', '8765'))
+# Keep Chrome open (and signed in to Unanet) between runs
+DAEMON_KEEP_BROWSER = os.getenv('DAEMON_KEEP_BROWSER', 'false').lower() in ('1', 'true', 'yes')
+# Download a fresh report on every run instead of reusing today's file
+DAEMON_REFRESH_REPORT = os.getenv('DAEMON_REFRESH_REPORT', 'true').lower() in ('1', 'true', 'yes')
+
+# === PROFILING (--profile) ===
+# Functions/allocations listed per phase in logs/profile_*/summary.txt
+PROFILE_TOP_N = int(os.getenv('PROFILE_TOP_N', '25'))
+# Wall-clock stack sampling interval for the flame graph output
+PROFILE_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', '10'))
+
+# === DUPLICATE ROWS ===
+# 'off', 'last' (later row replaces earlier ones) or 'sum' (hours and amounts are added up)
+DEDUP_POLICY = os.getenv('DEDUP_POLICY', 'off').lower()
+# CSV columns that identify a timesheet line (empty = all columns, i.e. exact duplicates)
+DEDUP_KEY_COLUMNS = [c.strip() for c in os.getenv('DEDUP_KEY_COLUMNS', '').split(',') if c.strip()]
+# Rows kept in memory while looking for duplicates; duplicates further apart are not collapsed
+DEDUP_WINDOW = int(os.getenv('DEDUP_WINDOW', '200000'))
+
+# === SHARDED SYNC (cli.py shard-plan / shard-worker) ===
+# Lease table shared by the workers; keep it on a local disk (SQLite locking is unreliable on SMB/NFS)
+SHARD_DB_FILE = PROJECT_DIR / os.getenv('SHARD_DB_FILE', 'shards.db')
+# Lock-file directory shared by workers on several hosts (e.g. a network share); replaces SHARD_DB_FILE when set
+SHARD_LOCK_DIR = os.getenv('SHARD_LOCK_DIR', '')
+SHARD_DAYS = int(os.getenv('SHARD_DAYS', '30'))
+# A worker that stops renewing its lease for this long loses the shard to another worker
+SHARD_LEASE_SECONDS = int(os.getenv('SHARD_LEASE_SECONDS', '600'))
+SHARD_MAX_ATTEMPTS = int(os.getenv('SHARD_MAX_ATTEMPTS', '3'))
+
+# === TRANSPORT ===
+# gzip $batch request bodies; turned off automatically if Dataverse rejects them
+DATAVERSE_COMPRESS_REQUESTS = os.getenv('DATAVERSE_COMPRESS_REQUESTS', 'false').lower() in ('1', 'true', 'yes')
+
+# === VERIFICATION ===
+# After each sync, compare per-partition row counts and sums with Dataverse ($apply)
+VERIFY_AFTER_SYNC = os.getenv('VERIFY_AFTER_SYNC', 'false').lower() in ('1', 'true', 'yes')
+VERIFY_PARTITION = os.getenv('VERIFY_PARTITION', 'month').lower()      # 'day', 'week' or 'month'
+# Re-sync (replace) the partitions that differ; otherwise only report them
+VERIFY_RESYNC = os.getenv('VERIFY_RESYNC', 'true').lower() in ('1', 'true', 'yes')
+
+# === RATE LIMIT ===
+# Token bucket shared by every process on this machine (SQLite file), per Dataverse user.
+# Dataverse allows 6000 requests per 5 minutes per user; stay just under it. 0 = off
+DATAVERSE_RATE_LIMIT_PER_MINUTE = float(os.getenv('DATAVERSE_RATE_LIMIT_PER_MINUTE', '1100'))
+DATAVERSE_RATE_LIMIT_BURST = int(os.getenv('DATAVERSE_RATE_LIMIT_BURST', '50'))
+RATE_LIMIT_DB_FILE = PROJECT_DIR / os.getenv('RATE_LIMIT_DB_FILE', 'ratelimit.db')
@@ -1,33 +1,119 @@
 import csv
+import gzip
+import json
+import re
+import sys
+import threading
 import requests
 import uuid
-from msal import PublicClientApplication
+from collections.abc import Mapping
 from config import (
     DATAVERSE_URL,
     DATAVERSE_USERNAME,
     DATAVERSE_PASSWORD,
     TABLE_PREFIX,
     TABLE_NAME,
-    BATCH_SIZE
+    BATCH_SIZE,
+    DATAVERSE_MAX_CONCURRENCY,
+    REPLACE_PARTITION,
+    VALIDATE_RECORDS,
+    ARCHIVE_ENABLED,
+    DEDUP_POLICY,
+    DATAVERSE_COMPRESS_REQUESTS
 )
-from logger import get_logger
+from dataverse_metadata import get_entity_metadata, get_primary_key_field, validate_records
+from logger import get_logger, SAMPLED
+from rate_limiter import acquire, send_throttled
 
 
-def get_dataverse_token():
-    """Authenticate to Dataverse using username/password"""
-    # Microsoft Dynamics 365 client ID (public client for username/password flow)
-    client_id = "51f81489-12ee-4a9e-aaae-a2591f45987d"
-    authority = "https://login.microsoftonline.com/organizations"
+# Global cap on in-flight $batch requests, shared by every thread in the process
+# (the multi-job orchestrator runs several pipelines against Dataverse at once)
+_batch_slots = threading.BoundedSemaphore(DATAVERSE_MAX_CONCURRENCY)
+
+# MSAL client and its token cache, shared by every caller in the process
+_msal_app = None
+_token_lock = threading.Lock()
+
+# HTTP session (keep-alive connection pool), shared by every caller in the process
+_session = None
+_session_lock = threading.Lock()
+
+# Request body compression: off, on but not yet accepted, or confirmed by a 2xx
+_compression = {"enabled": DATAVERSE_COMPRESS_REQUESTS, "confirmed": False}
+_compression_lock = threading.Lock()
+
+# Paging responses are parsed as they stream in: each flat record object and
+# the next-page link. Only used for $select lists of ids, dates and numbers,
+# whose values never contain braces.
+_RECORD_OBJECT = re.compile(rb"\{[^{}]*\}")
+_NEXT_LINK = re.compile(rb'"@odata\.nextLink"\s*:\s*("(?:[^"\\]|\\.)*")')
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Dataverse limit for operations in a single $batch request
+MAX_BATCH_OPERATIONS = 1000
+DELETE_BATCH_SIZE = MAX_BATCH_OPERATIONS
+
+
+def _get_msal_app():
+    """Create the MSAL client once per process so its token cache is reused"""
+    global _msal_app
 
-    app = PublicClientApplication(client_id=client_id, authority=authority)
+    if _msal_app is None:
+        # Imported here so commands that never authenticate start faster
+        from msal import PublicClientApplication
 
-    # Get token using username/password
+        # Microsoft Dynamics 365 client ID (public client for username/password flow)
+        client_id = "51f81489-12ee-4a9e-aaae-a2591f45987d"
+        authority = "https://login.microsoftonline.com/organizations"
+
+        _msal_app = PublicClientApplication(client_id=client_id, authority=authority)
+
+    return _msal_app
+
+
+def get_session():
+    """
+    Return the shared requests session
+
+    Reusing one session keeps TLS connections to Dataverse open between
+    requests (and between runs in the sync daemon).
+    """
+    global _session
+
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(10, DATAVERSE_MAX_CONCURRENCY))
+            session.mount("https://", adapter)
+            _session = session
+
+    return _session
+
+
+def get_dataverse_token():
+    """
+    Authenticate to Dataverse using username/password
+
+    Tokens are cached in-process: later calls return the cached token (or
+    refresh it silently) instead of signing in again.
+    """
     scopes = [f"{DATAVERSE_URL}/.default"]
-    result = app.acquire_token_by_username_password(
-        username=DATAVERSE_USERNAME,
-        password=DATAVERSE_PASSWORD,
-        scopes=scopes
-    )
+
+    with _token_lock:
+        app = _get_msal_app()
+
+        # Reuse a cached token for this user if there is one
+        for account in app.get_accounts(username=DATAVERSE_USERNAME):
+            result = app.acquire_token_silent(scopes, account=account)
+            if result and "access_token" in result:
+                return result["access_token"]
+
+        # Get token using username/password
+        result = app.acquire_token_by_username_password(
+            username=DATAVERSE_USERNAME,
+            password=DATAVERSE_PASSWORD,
+            scopes=scopes
+        )
 
     if "access_token" in result:
         return result["access_token"]
@@ -45,68 +131,168 @@ def convert_to_decimal(value):
         return None
 
 
-def map_csv_row_to_dataverse(row):
+# Report columns in Dataverse column order; the Dataverse column is
+# f"{table_prefix}_{column.lower()}"
+CSV_COLUMNS = (
+    "ProjectOrganization", "ProjectCode", "TaskNumber", "Task", "LaborCategory",
+    "Location", "ProjectType", "PayCode", "Person", "Reference", "Date",
+    "ADJPostedDate", "FinancialPostedDate", "BillingCurrency", "BillRateBC",
+    "Hours", "BillAmountBC", "BillableAmountBC", "LocalCurrency",
+    "BillAmountLC", "BillableAmountLC"
+)
+DECIMAL_COLUMNS = frozenset({
+    "BillRateBC", "Hours", "BillAmountBC", "BillableAmountBC", "BillAmountLC", "BillableAmountLC"
+})
+RECORD_FIELDS = tuple(column.lower() for column in CSV_COLUMNS)
+_FIELD_SET = frozenset(RECORD_FIELDS)
+
+
+class DataverseRecord(Mapping):
+    """
+    One mapped report row
+
+    Values live in slots instead of a dict with 21 prefixed keys, and
+    repeated text values (project codes, people, dates) are interned, so
+    large reports take a fraction of the memory. Reads like a mapping keyed
+    by Dataverse column name (record[f"{prefix}_date"], .get(), .items());
+    to_dict() builds the JSON payload at serialization time.
+    """
+
+    __slots__ = ("prefix",) + RECORD_FIELDS
+
+    def __init__(self, prefix, values):
+        self.prefix = prefix
+        for field, value in zip(RECORD_FIELDS, values):
+            setattr(self, field, value)
+
+    @classmethod
+    def from_csv_values(cls, values, table_prefix):
+        """Build a record from raw CSV strings in CSV_COLUMNS order"""
+        converted = []
+        for column, value in zip(CSV_COLUMNS, values):
+            if column in DECIMAL_COLUMNS:
+                converted.append(convert_to_decimal(value))
+            else:
+                converted.append(sys.intern(value) if value else None)
+        return cls(table_prefix, converted)
+
+    def _field(self, key):
+        """Slot name for a Dataverse column name"""
+        prefix = self.prefix
+        if key[:len(prefix) + 1] == prefix + "_":
+            field = key[len(prefix) + 1:]
+            if field in _FIELD_SET:
+                return field
+        raise KeyError(key)
+
+    def __getitem__(self, key):
+        return getattr(self, self._field(key))
+
+    def __setitem__(self, key, value):
+        setattr(self, self._field(key), value)
+
+    def __iter__(self):
+        prefix = self.prefix
+        return (f"{prefix}_{field}" for field in RECORD_FIELDS)
+
+    def __len__(self):
+        return len(RECORD_FIELDS)
+
+    def __repr__(self):
+        return f"DataverseRecord({self.to_dict()!r})"
+
+    def copy(self):
+        """Shallow copy of the record"""
+        return DataverseRecord(self.prefix, [getattr(self, field) for field in RECORD_FIELDS])
+
+    def to_dict(self):
+        """JSON payload for the Dataverse Web API"""
+        prefix = self.prefix
+        return {f"{prefix}_{field}": getattr(self, field) for field in RECORD_FIELDS}
+
+
+def map_csv_row_to_dataverse(row, table_prefix=None):
     """Map CSV columns to Dataverse columns with proper type conversion"""
-    return {
-        f"{TABLE_PREFIX}_projectorganization": row.get("ProjectOrganization") or None,
-        f"{TABLE_PREFIX}_projectcode": row.get("ProjectCode") or None,
-        f"{TABLE_PREFIX}_tasknumber": row.get("TaskNumber") or None,
-        f"{TABLE_PREFIX}_task": row.get("Task") or None,
-        f"{TABLE_PREFIX}_laborcategory": row.get("LaborCategory") or None,
-        f"{TABLE_PREFIX}_location": row.get("Location") or None,
-        f"{TABLE_PREFIX}_projecttype": row.get("ProjectType") or None,
-        f"{TABLE_PREFIX}_paycode": row.get("PayCode") or None,
-        f"{TABLE_PREFIX}_person": row.get("Person") or None,
-        f"{TABLE_PREFIX}_reference": row.get("Reference") or None,
-        f"{TABLE_PREFIX}_date": row.get("Date") or None,
-        f"{TABLE_PREFIX}_adjposteddate": row.get("ADJPostedDate") or None,
-        f"{TABLE_PREFIX}_financialposteddate": row.get("FinancialPostedDate") or None,
-        f"{TABLE_PREFIX}_billingcurrency": row.get("BillingCurrency") or None,
-        f"{TABLE_PREFIX}_billratebc": convert_to_decimal(row.get("BillRateBC")),
-        f"{TABLE_PREFIX}_hours": convert_to_decimal(row.get("Hours")),
-        f"{TABLE_PREFIX}_billamountbc": convert_to_decimal(row.get("BillAmountBC")),
-        f"{TABLE_PREFIX}_billableamountbc": convert_to_decimal(row.get("BillableAmountBC")),
-        f"{TABLE_PREFIX}_localcurrency": row.get("LocalCurrency") or None,
-        f"{TABLE_PREFIX}_billamountlc": convert_to_decimal(row.get("BillAmountLC")),
-        f"{TABLE_PREFIX}_billableamountlc": convert_to_decimal(row.get("BillableAmountLC"))
-    }
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
 
+    return DataverseRecord.from_csv_values([row.get(column) for column in CSV_COLUMNS], table_prefix)
 
-def read_csv_records(csv_file_path):
-    """Read CSV file and convert to Dataverse records"""
+
+def iter_csv_records(csv_file_path, table_prefix=None, start_date=None, end_date=None):
+    """
+    Read CSV file and yield Dataverse records one at a time
+
+    Rows outside start_date..end_date (YYYY-MM-DD, both required to filter)
+    are skipped while reading, so they are never held in memory.
+    """
     logger = get_logger()
     logger.info(f"Reading CSV from: {csv_file_path}")
-    records = []
+
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
+
+    in_range = _date_range_check(start_date, end_date)
+
     with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
         reader = csv.DictReader(csvfile)
         for row in reader:
-            data = map_csv_row_to_dataverse(row)
-            records.append(data)
-    return records
+            if in_range is None or in_range(row.get("Date")):
+                yield map_csv_row_to_dataverse(row, table_prefix)
 
 
-def upload_batch(token, batch):
-    """Upload a batch of records to Dataverse"""
-    batch_id = str(uuid.uuid4())
-    changeset_id = str(uuid.uuid4())
+def read_csv_records(csv_file_path, table_prefix=None, start_date=None, end_date=None):
+    """Read CSV file and convert to Dataverse records (see iter_csv_records)"""
+    return list(iter_csv_records(csv_file_path, table_prefix, start_date, end_date))
 
-    # Build batch request body
-    batch_body = f"--batch_{batch_id}\n"
-    batch_body += f"Content-Type: multipart/mixed; boundary=changeset_{changeset_id}\n\n"
-
-    for idx, record in enumerate(batch):
-        batch_body += f"--changeset_{changeset_id}\n"
-        batch_body += "Content-Type: application/http\n"
-        batch_body += "Content-Transfer-Encoding: binary\n"
-        batch_body += f"Content-ID: {idx + 1}\n\n"
-        batch_body += f"POST {DATAVERSE_URL}/api/data/v9.2/{TABLE_NAME} HTTP/1.1\n"
-        batch_body += "Content-Type: application/json; charset=utf-8\n\n"
-        batch_body += f"{requests.compat.json.dumps(record)}\n"
-
-    batch_body += f"--changeset_{changeset_id}--\n"
-    batch_body += f"--batch_{batch_id}--\n"
 
-    # Send batch request
+def encode_batch_body(batch_body):
+    """
+    Encode a $batch body for sending, gzip-compressed if enabled
+
+    Returns:
+        Tuple of (body bytes, extra request headers)
+    """
+    data = batch_body.encode("utf-8")
+    if not _compression["enabled"]:
+        return data, {}
+    return gzip.compress(data, compresslevel=6), {"Content-Encoding": "gzip"}
+
+
+def compression_rejected(status_code):
+    """
+    Record how Dataverse answered a compressed request
+
+    Only call this for a request that was sent compressed. Until a
+    compressed batch has succeeded once, a 400/415 answer turns compression
+    off for the rest of the process. The resend decision is made for each
+    request, so compressed requests already in flight when another thread
+    turned compression off are resent too.
+
+    Returns:
+        True if the request should be resent uncompressed
+    """
+    with _compression_lock:
+        if _compression["confirmed"]:
+            return False
+        if status_code in (400, 415):
+            if _compression["enabled"]:
+                _compression["enabled"] = False
+                get_logger().warning(f"Dataverse rejected a gzip request body ({status_code}); "
+                                     f"sending uncompressed from now on")
+            return True
+        if status_code < 400:
+            _compression["confirmed"] = True
+        return False
+
+
+def post_batch(token, batch_id, batch_body):
+    """
+    Send a $batch request body to Dataverse
+
+    Blocks while DATAVERSE_MAX_CONCURRENCY requests are already in flight,
+    or until the shared rate limit allows another request
+    """
     headers = {
         "Authorization": f"Bearer {token}",
         "Content-Type": f"multipart/mixed; boundary=batch_{batch_id}",
@@ -115,9 +301,163 @@ def upload_batch(token, batch):
     }
 
     url = f"{DATAVERSE_URL}/api/data/v9.2/$batch"
-    response = requests.post(url, headers=headers, data=batch_body)
+    data, extra_headers = encode_batch_body(batch_body)
+
+    def send():
+        with _batch_slots:
+            response = get_session().post(url, headers={**headers, **extra_headers}, data=data)
+            if extra_headers and compression_rejected(response.status_code):
+                acquire()
+                response = get_session().post(url, headers=headers, data=batch_body.encode("utf-8"))
+        return response
+
+    # A 429 is resent once the shared pause is over instead of failing the batch
+    return send_throttled(send)
+
+
+class PageScanner:
+    """Incrementally extract record objects and the next-page link from a paging response"""
+
+    def __init__(self):
+        self.buffer = b""
+        self.next_link = None
+
+    def feed(self, chunk):
+        """Add a chunk of the response body; returns the records completed by it"""
+        buffer = self.buffer + chunk
+        records = []
+        end = 0
+        for match in _RECORD_OBJECT.finditer(buffer):
+            records.append(json.loads(match.group()))
+            end = match.end()
+
+        if self.next_link is None and b"@odata.nextLink" in buffer:
+            link = _NEXT_LINK.search(buffer)
+            if link:
+                self.next_link = json.loads(link.group(1))
+
+        self.buffer = buffer[end:]
+        return records
+
+
+def iter_query_records(url, headers):
+    """
+    Follow @odata.nextLink and yield each record, parsing pages as they stream in
+
+    Pages are never held in memory as a whole; responses are gzip-compressed
+    in transit (requests negotiates it). Only for $select lists of ids,
+    dates and numbers (see PageScanner).
+
+    Raises:
+        RuntimeError: If a page request fails
+    """
+    logger = get_logger()
+
+    count = 0
+    while url:
+        scanner = PageScanner()
+        response = send_throttled(lambda: get_session().get(url, headers=headers, stream=True))
+        with response:
+            if response.status_code != 200:
+                raise RuntimeError(f"Error fetching records: {response.status_code} - {response.text}")
+
+            for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                for record in scanner.feed(chunk):
+                    count += 1
+                    yield record
+
+        # Check for next page
+        url = scanner.next_link
+        if url:
+            logger.info("  Fetched %d records so far, fetching more...", count, extra=SAMPLED)
+
+
+def _payload_json(payload):
+    """Plain dict for json.dumps (records are converted only here)"""
+    return payload.to_dict() if isinstance(payload, DataverseRecord) else payload
+
+
+def build_batch_body(changesets, table_name):
+    """
+    Build a multipart $batch body from one or more changesets
+
+    Each changeset is a list of operations applied atomically by Dataverse:
+    ("POST", record_dict) creates a record, ("PATCH", (record_id, changes))
+    updates one, and ("DELETE", record_id) removes one.
+
+    Returns:
+        Tuple of (batch_id, batch_body)
+    """
+    batch_id = str(uuid.uuid4())
+
+    # Build batch request body
+    batch_body = ""
+    content_id = 0
+    for operations in changesets:
+        changeset_id = str(uuid.uuid4())
+        batch_body += f"--batch_{batch_id}\n"
+        batch_body += f"Content-Type: multipart/mixed; boundary=changeset_{changeset_id}\n\n"
+
+        for method, payload in operations:
+            # Content-ID must be unique across the whole batch
+            content_id += 1
+            batch_body += f"--changeset_{changeset_id}\n"
+            batch_body += "Content-Type: application/http\n"
+            batch_body += "Content-Transfer-Encoding: binary\n"
+            batch_body += f"Content-ID: {content_id}\n\n"
+
+            if method == "POST":
+                batch_body += f"POST {DATAVERSE_URL}/api/data/v9.2/{table_name} HTTP/1.1\n"
+                batch_body += "Content-Type: application/json; charset=utf-8\n\n"
+                batch_body += f"{json.dumps(_payload_json(payload))}\n"
+            elif method == "PATCH":
+                record_id, changes = payload
+                batch_body += f"PATCH {DATAVERSE_URL}/api/data/v9.2/{table_name}({record_id}) HTTP/1.1\n"
+                batch_body += "Content-Type: application/json; charset=utf-8\n\n"
+                batch_body += f"{json.dumps(_payload_json(changes))}\n"
+            elif method == "DELETE":
+                batch_body += f"DELETE {DATAVERSE_URL}/api/data/v9.2/{table_name}({payload}) HTTP/1.1\n\n"
+            else:
+                raise ValueError(f"Unsupported batch operation: {method}")
+
+        batch_body += f"--changeset_{changeset_id}--\n"
+
+    batch_body += f"--batch_{batch_id}--\n"
+
+    return batch_id, batch_body
+
+
+def build_upload_batch_body(batch, table_name):
+    """Build a $batch body that creates each record in one changeset"""
+    return build_batch_body([[("POST", record) for record in batch]], table_name)
+
+
+def build_delete_batch_body(record_ids, table_name):
+    """Build a $batch body that deletes each record id in one changeset"""
+    return build_batch_body([[("DELETE", record_id) for record_id in record_ids]], table_name)
+
+
+def batch_succeeded(response):
+    """
+    Check a $batch response for failures
+
+    A failed changeset can come back inside a 200 response, so the
+    individual part status lines are checked as well.
+    """
+    if response.status_code not in [200, 201, 204]:
+        return False
+    return re.search(r"^HTTP/1\.1 [45]\d\d", response.text, re.MULTILINE) is None
+
 
-    return response
+def upload_batch(token, batch, table_name=None):
+    """Upload a batch of records to Dataverse"""
+    if table_name is None:
+        table_name = TABLE_NAME
+
+    batch_id, batch_body = build_upload_batch_body(batch, table_name)
+
+    # Send batch request
+    return post_batch(token, batch_id, batch_body)
 
 
 def parse_date(date_string):
@@ -145,30 +485,85 @@ def parse_date(date_string):
     return None
 
 
-def filter_records_by_date(records, start_date, end_date):
-    """Filter records to only include those within the date range"""
+def _date_range_check(start_date, end_date):
+    """
+    Return a function that tells whether a raw date string is in the range,
+    or None if the range is open (both dates are needed to filter)
+    """
     from datetime import datetime
 
     if not start_date or not end_date:
+        return None
+
+    # Normalise so plain string comparison orders dates correctly
+    start_date = datetime.strptime(start_date, "%Y-%m-%d").strftime("%Y-%m-%d")
+    end_date = datetime.strptime(end_date, "%Y-%m-%d").strftime("%Y-%m-%d")
+
+    # Reports repeat the same few hundred dates; parse each one once
+    parsed = {}
+
+    def in_range(date_string):
+        if not date_string:
+            return False
+        if date_string not in parsed:
+            parsed[date_string] = parse_date(date_string)
+        date = parsed[date_string]
+        return date is not None and start_date <= date <= end_date
+
+    return in_range
+
+
+def filter_records_by_date(records, start_date, end_date, table_prefix=None):
+    """Filter records to only include those within the date range"""
+    in_range = _date_range_check(start_date, end_date)
+    if in_range is None:
         return records
 
-    start_dt = datetime.strptime(start_date, "%Y-%m-%d")
-    end_dt = datetime.strptime(end_date, "%Y-%m-%d")
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
 
-    filtered_records = []
-    for record in records:
-        date_field = record.get(f"{TABLE_PREFIX}_date")
-        if date_field:
-            parsed_date = parse_date(date_field)
-            if parsed_date:
-                record_dt = datetime.strptime(parsed_date, "%Y-%m-%d")
-                if start_dt <= record_dt <= end_dt:
-                    filtered_records.append(record)
+    date_field_name = f"{table_prefix}_date"
+    return [record for record in records if in_range(record.get(date_field_name))]
+
+
+def load_records(csv_file_path, start_date=None, end_date=None, table_prefix=None):
+    """
+    Load the records of a downloaded report, optionally limited to a date range
+
+    Reads from the columnar archive when ARCHIVE_ENABLED and the report has
+    been archived (only the month partitions in range are opened); otherwise
+    parses the CSV, dropping rows outside the range as it goes. Duplicate
+    rows are collapsed according to DEDUP_POLICY (see dedupe.py).
+    """
+    logger = get_logger()
 
-    return filtered_records
+    if ARCHIVE_ENABLED:
+        from report_archive import is_archived, read_archive_records
 
+        if is_archived(csv_file_path):
+            logger.info(f"Reading archived rows for: {csv_file_path}")
+            records = read_archive_records(csv_file_path, start_date, end_date, table_prefix)
+            if DEDUP_POLICY != "off":
+                from dedupe import dedupe_records
 
-def upload_to_dataverse(csv_file_path, start_date=None, end_date=None):
+                records = list(dedupe_records(records))
+            return records
+
+    # Filter by date range while reading if specified
+    if start_date and end_date:
+        logger.info(f"Keeping records between {start_date} and {end_date}...")
+
+    records = iter_csv_records(csv_file_path, table_prefix, start_date, end_date)
+    if DEDUP_POLICY != "off":
+        from dedupe import dedupe_records
+
+        # Collapse duplicates as rows stream in, before they reach the batcher
+        records = dedupe_records(records)
+    return list(records)
+
+
+def upload_to_dataverse(csv_file_path, start_date=None, end_date=None,
+                        table_name=None, table_prefix=None, token=None):
     """
     Read CSV and upload data to Dataverse table using batch requests
 
@@ -176,46 +571,71 @@ def upload_to_dataverse(csv_file_path, start_date=None, end_date=None):
         csv_file_path: Path to the CSV file
         start_date: Optional start date (YYYY-MM-DD) to filter records
         end_date: Optional end date (YYYY-MM-DD) to filter records
+        table_name: Target table (default: TABLE_NAME from config)
+        table_prefix: Column prefix (default: TABLE_PREFIX from config)
+        token: Optional access token to reuse instead of authenticating
+
+    Returns:
+        True if every batch was accepted
     """
     logger = get_logger()
+
+    if table_name is None:
+        table_name = TABLE_NAME
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
+
     logger.info("=== Uploading to Dataverse ===")
 
     # Get authentication token
-    logger.info("Authenticating to Dataverse...")
-    token = get_dataverse_token()
+    if token is None:
+        logger.info("Authenticating to Dataverse...")
+        token = get_dataverse_token()
 
-    # Read CSV file and prepare all records
-    records = read_csv_records(csv_file_path)
+    # Read CSV file (or its archive) and prepare all records in the range
+    records = load_records(csv_file_path, start_date, end_date, table_prefix)
 
-    # Filter by date range if specified
-    if start_date and end_date:
-        logger.info(f"Filtering records between {start_date} and {end_date}...")
-        records = filter_records_by_date(records, start_date, end_date)
+    # Catch schema errors locally instead of failing whole batches
+    loaded_records = len(records)
+    if VALIDATE_RECORDS:
+        records = validate_records(records, get_entity_metadata(token, table_name))
+    skipped_records = loaded_records - len(records)
 
     total_records = len(records)
     logger.info(f"Found {total_records} records to upload")
 
     if total_records == 0:
         logger.warning("No records to upload")
-        return
+        return skipped_records == 0
+
+    from dataverse_planning import plan_upload
+
+    estimate = plan_upload(total_records)
+    logger.info(f"Estimated upload: {estimate['batches']} batch requests, ~{estimate['minutes']} minutes")
 
     # Upload in batches
     row_count = 0
     for i in range(0, total_records, BATCH_SIZE):
         batch = records[i:i + BATCH_SIZE]
-        response = upload_batch(token, batch)
+        response = upload_batch(token, batch, table_name)
 
-        if response.status_code in [200, 201, 204]:
+        if batch_succeeded(response):
             batch_count = len(batch)
             row_count += batch_count
-            logger.info(f"  Uploaded batch {i // BATCH_SIZE + 1}: {batch_count} records (Total: {row_count}/{total_records})")
+            logger.info("  Uploaded batch %d: %d records (Total: %d/%d)",
+                        i // BATCH_SIZE + 1, batch_count, row_count, total_records, extra=SAMPLED)
         else:
             logger.error(f"  Error uploading batch {i // BATCH_SIZE + 1}: {response.status_code} - {response.text[:500]}")
 
-    logger.info(f"✓ Successfully uploaded {row_count} rows to Dataverse table '{TABLE_NAME}'")
+    logger.info(f"✓ Successfully uploaded {row_count} rows to Dataverse table '{table_name}'")
+    if skipped_records:
+        logger.warning(f"{skipped_records} rows were skipped by validation and not uploaded")
+    # Rows dropped by validation are missing from the table too
+    return row_count == total_records and skipped_records == 0
 
 
-def delete_records_in_date_range(start_date, end_date, date_field_name=None):
+def delete_records_in_date_range(start_date, end_date, date_field_name=None,
+                                 table_name=None, table_prefix=None, token=None):
     """
     Delete all records from the table where the date is within the specified range
 
@@ -223,17 +643,28 @@ def delete_records_in_date_range(start_date, end_date, date_field_name=None):
         start_date: Start date in format 'YYYY-MM-DD'
         end_date: End date in format 'YYYY-MM-DD'
         date_field_name: Name of the date field to filter on (default: cr834_date)
+        table_name: Target table (default: TABLE_NAME from config)
+        table_prefix: Column prefix (default: TABLE_PREFIX from config)
+        token: Optional access token to reuse instead of authenticating
+
+    Returns:
+        True if every matching record was deleted
     """
     logger = get_logger()
 
+    if table_name is None:
+        table_name = TABLE_NAME
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
     if date_field_name is None:
-        date_field_name = f"{TABLE_PREFIX}_date"
+        date_field_name = f"{table_prefix}_date"
 
     logger.info(f"=== Deleting Records Between {start_date} and {end_date} ===")
 
     # Get authentication token
-    logger.info("Authenticating to Dataverse...")
-    token = get_dataverse_token()
+    if token is None:
+        logger.info("Authenticating to Dataverse...")
+        token = get_dataverse_token()
 
     headers = {
         "Authorization": f"Bearer {token}",
@@ -244,90 +675,60 @@ def delete_records_in_date_range(start_date, end_date, date_field_name=None):
     }
 
     # Query for records in the date range with pagination
-    primary_key_field = f"{TABLE_NAME.rstrip('s')}id"
+    primary_key_field = get_primary_key_field(token, table_name)
     filter_query = f"?$filter={date_field_name} ge '{start_date}' and {date_field_name} le '{end_date}'&$select={primary_key_field}"
-    url = f"{DATAVERSE_URL}/api/data/v9.2/{TABLE_NAME}{filter_query}"
+    url = f"{DATAVERSE_URL}/api/data/v9.2/{table_name}{filter_query}"
 
     logger.info(f"Fetching records where {start_date} <= {date_field_name} <= {end_date}...")
 
-    # Fetch all records using pagination
-    records = []
-    while url:
-        response = requests.get(url, headers=headers)
-
-        if response.status_code != 200:
-            logger.error(f"Error fetching records: {response.status_code} - {response.text}")
-            return
-
-        data = response.json()
-        batch_records = data.get('value', [])
-        records.extend(batch_records)
-
-        # Check for next page
-        url = data.get('@odata.nextLink', None)
-        if url:
-            logger.info(f"  Fetched {len(records)} records so far, fetching more...")
+    # Fetch all record ids using pagination (only the GUIDs are kept)
+    try:
+        record_ids = [record[primary_key_field] for record in iter_query_records(url, headers)]
+    except RuntimeError as e:
+        logger.error(str(e))
+        return False
 
-    total_records = len(records)
+    total_records = len(record_ids)
     logger.info(f"Total records fetched: {total_records}")
 
     if total_records == 0:
         logger.info(f"No records found in date range {start_date} to {end_date}")
-        return
+        return True
 
     logger.info(f"Found {total_records} records to delete")
 
     # Delete records in batches (max 1000 per changeset)
     deleted_count = 0
-    DELETE_BATCH_SIZE = 1000  # Dataverse limit for operations in a changeset
     for i in range(0, total_records, DELETE_BATCH_SIZE):
-        batch = records[i:i + DELETE_BATCH_SIZE]
-        batch_id = str(uuid.uuid4())
-        changeset_id = str(uuid.uuid4())
+        batch = record_ids[i:i + DELETE_BATCH_SIZE]
 
         # Build batch delete request body
-        batch_body = f"--batch_{batch_id}\n"
-        batch_body += f"Content-Type: multipart/mixed; boundary=changeset_{changeset_id}\n\n"
-
-        for idx, record in enumerate(batch):
-            record_id = record[primary_key_field]
-            batch_body += f"--changeset_{changeset_id}\n"
-            batch_body += "Content-Type: application/http\n"
-            batch_body += "Content-Transfer-Encoding: binary\n"
-            batch_body += f"Content-ID: {idx + 1}\n\n"
-            batch_body += f"DELETE {DATAVERSE_URL}/api/data/v9.2/{TABLE_NAME}({record_id}) HTTP/1.1\n\n"
-
-        batch_body += f"--changeset_{changeset_id}--\n"
-        batch_body += f"--batch_{batch_id}--\n"
+        batch_id, batch_body = build_delete_batch_body(batch, table_name)
 
         # Send batch delete request
-        delete_headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": f"multipart/mixed; boundary=batch_{batch_id}",
-            "OData-MaxVersion": "4.0",
-            "OData-Version": "4.0"
-        }
+        response = post_batch(token, batch_id, batch_body)
 
-        url = f"{DATAVERSE_URL}/api/data/v9.2/$batch"
-        response = requests.post(url, headers=delete_headers, data=batch_body)
-
-        if response.status_code in [200, 201, 204]:
+        # A failed changeset can come back inside a 200 response
+        if batch_succeeded(response):
             batch_count = len(batch)
             deleted_count += batch_count
-            logger.info(f"  Deleted batch {i // DELETE_BATCH_SIZE + 1}: {batch_count} records (Total: {deleted_count}/{total_records})")
+            logger.info("  Deleted batch %d: %d records (Total: %d/%d)",
+                        i // DELETE_BATCH_SIZE + 1, batch_count, deleted_count, total_records, extra=SAMPLED)
         else:
             logger.error(f"  Error deleting batch {i // DELETE_BATCH_SIZE + 1}: {response.status_code} - {response.text[:500]}")
 
-    logger.info(f"✓ Successfully deleted {deleted_count} records from table '{TABLE_NAME}'")
+    logger.info(f"✓ Successfully deleted {deleted_count} records from table '{table_name}'")
+    return deleted_count == total_records
 
 
-def delete_records_after_date(date_string, date_field_name=None):
+def delete_records_after_date(date_string, date_field_name=None, token=None):
     """
     Delete all records from the table where the date is after the specified date
 
     Args:
         date_string: Date in format 'YYYY-MM-DD' (e.g., '2024-01-01')
         date_field_name: Name of the date field to filter on (default: cr834_date)
+        token: Optional access token to reuse instead of authenticating
     """
     logger = get_logger()
 
@@ -337,8 +738,9 @@ def delete_records_after_date(date_string, date_field_name=None):
     logger.info(f"=== Deleting Records After {date_string} ===")
 
     # Get authentication token
-    logger.info("Authenticating to Dataverse...")
-    token = get_dataverse_token()
+    if token is None:
+        logger.info("Authenticating to Dataverse...")
+        token = get_dataverse_token()
 
     headers = {
         "Authorization": f"Bearer {token}",
@@ -350,32 +752,20 @@ def delete_records_after_date(date_string, date_field_name=None):
 
     # Query for records after the specified date with pagination
     # Note: Date format in OData filter should be YYYY-MM-DD
-    # Primary key is usually: {table_logical_name}id
-    primary_key_field = f"{TABLE_NAME.rstrip('s')}id"
+    primary_key_field = get_primary_key_field(token, TABLE_NAME)
     filter_query = f"?$filter={date_field_name} gt '{date_string}'&$select={primary_key_field}"
     url = f"{DATAVERSE_URL}/api/data/v9.2/{TABLE_NAME}{filter_query}"
 
     logger.info(f"Fetching records where {date_field_name} > {date_string}...")
 
-    # Fetch all records using pagination
-    records = []
-    while url:
-        response = requests.get(url, headers=headers)
-
-        if response.status_code != 200:
-            logger.error(f"Error fetching records: {response.status_code} - {response.text}")
-            return
-
-        data = response.json()
-        batch_records = data.get('value', [])
-        records.extend(batch_records)
-
-        # Check for next page
-        url = data.get('@odata.nextLink', None)
-        if url:
-            logger.info(f"  Fetched {len(records)} records so far, fetching more...")
+    # Fetch all record ids using pagination (only the GUIDs are kept)
+    try:
+        record_ids = [record[primary_key_field] for record in iter_query_records(url, headers)]
+    except RuntimeError as e:
+        logger.error(str(e))
+        return
 
-    total_records = len(records)
+    total_records = len(record_ids)
     logger.info(f"Total records fetched: {total_records}")
 
     if total_records == 0:
@@ -386,43 +776,197 @@ def delete_records_after_date(date_string, date_field_name=None):
 
     # Delete records in batches (max 1000 per changeset)
     deleted_count = 0
-    DELETE_BATCH_SIZE = 1000  # Dataverse limit for operations in a changeset
     for i in range(0, total_records, DELETE_BATCH_SIZE):
-        batch = records[i:i + DELETE_BATCH_SIZE]
-        batch_id = str(uuid.uuid4())
-        changeset_id = str(uuid.uuid4())
+        batch = record_ids[i:i + DELETE_BATCH_SIZE]
 
         # Build batch delete request body
-        batch_body = f"--batch_{batch_id}\n"
-        batch_body += f"Content-Type: multipart/mixed; boundary=changeset_{changeset_id}\n\n"
-
-        for idx, record in enumerate(batch):
-            record_id = record[primary_key_field]
-            batch_body += f"--changeset_{changeset_id}\n"
-            batch_body += "Content-Type: application/http\n"
-            batch_body += "Content-Transfer-Encoding: binary\n"
-            batch_body += f"Content-ID: {idx + 1}\n\n"
-            batch_body += f"DELETE {DATAVERSE_URL}/api/data/v9.2/{TABLE_NAME}({record_id}) HTTP/1.1\n\n"
-
-        batch_body += f"--changeset_{changeset_id}--\n"
-        batch_body += f"--batch_{batch_id}--\n"
+        batch_id, batch_body = build_delete_batch_body(batch, TABLE_NAME)
 
         # Send batch delete request
-        delete_headers = {
-            "Authorization": f"Bearer {token}",
-            "Content-Type": f"multipart/mixed; boundary=batch_{batch_id}",
-            "OData-MaxVersion": "4.0",
-            "OData-Version": "4.0"
-        }
-
-        url = f"{DATAVERSE_URL}/api/data/v9.2/$batch"
-        response = requests.post(url, headers=delete_headers, data=batch_body)
+        response = post_batch(token, batch_id, batch_body)
 
-        if response.status_code in [200, 201, 204]:
+        # A failed changeset can come back inside a 200 response
+        if batch_succeeded(response):
             batch_count = len(batch)
             deleted_count += batch_count
-            logger.info(f"  Deleted batch {i // DELETE_BATCH_SIZE + 1}: {batch_count} records (Total: {deleted_count}/{total_records})")
+            logger.info("  Deleted batch %d: %d records (Total: %d/%d)",
+                        i // DELETE_BATCH_SIZE + 1, batch_count, deleted_count, total_records, extra=SAMPLED)
         else:
             logger.error(f"  Error deleting batch {i // DELETE_BATCH_SIZE + 1}: {response.status_code} - {response.text[:500]}")
 
     logger.info(f"✓ Successfully deleted {deleted_count} records from table '{TABLE_NAME}'")
+
+
+def partition_key(date_string, granularity):
+    """
+    Map a YYYY-MM-DD date to the first day of its partition
+
+    Args:
+        date_string: Date in format 'YYYY-MM-DD'
+        granularity: 'day', 'week' (ISO weeks starting Monday) or 'month'
+    """
+    from datetime import datetime, timedelta
+
+    if granularity == "day":
+        return date_string
+
+    dt = datetime.strptime(date_string, "%Y-%m-%d")
+    if granularity == "week":
+        return (dt - timedelta(days=dt.weekday())).strftime("%Y-%m-%d")
+    if granularity == "month":
+        return dt.strftime("%Y-%m-01")
+
+    raise ValueError(f"Unknown partition granularity: {granularity}")
+
+
+def replace_records_in_date_range(csv_file_path, start_date, end_date, partition=None,
+                                  table_name=None, table_prefix=None, token=None):
+    """
+    Replace the records in a date range with the CSV contents, one partition at a time
+
+    The range is split into partitions (day/week/month). Each partition's
+    DELETEs for the existing rows and POSTs for the new rows go into a single
+    changeset, so Dataverse swaps the partition atomically and readers never
+    see it empty. Small partitions are packed together into $batch requests
+    of at most BATCH_SIZE new rows.
+
+    A partition with more than BATCH_SIZE new rows or MAX_BATCH_OPERATIONS
+    operations is swapped one day per changeset instead, so each day stays
+    atomic. Only a single day above MAX_BATCH_OPERATIONS is split further
+    and is no longer atomic (a warning is logged).
+
+    Args:
+        csv_file_path: Path to the CSV file
+        start_date: Start date in format 'YYYY-MM-DD'
+        end_date: End date in format 'YYYY-MM-DD'
+        partition: 'day', 'week' or 'month' (default: REPLACE_PARTITION from config)
+        table_name: Target table (default: TABLE_NAME from config)
+        table_prefix: Column prefix (default: TABLE_PREFIX from config)
+        token: Optional access token to reuse instead of authenticating
+
+    Returns:
+        True if every partition was replaced
+    """
+    logger = get_logger()
+
+    if partition is None:
+        partition = REPLACE_PARTITION
+    if table_name is None:
+        table_name = TABLE_NAME
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
+    date_field_name = f"{table_prefix}_date"
+
+    logger.info(f"=== Replacing Records Between {start_date} and {end_date} (per {partition}) ===")
+
+    if token is None:
+        logger.info("Authenticating to Dataverse...")
+        token = get_dataverse_token()
+
+    # New rows, grouped by partition
+    records = load_records(csv_file_path, start_date, end_date, table_prefix)
+    if VALIDATE_RECORDS:
+        records = validate_records(records, get_entity_metadata(token, table_name))
+
+    # Operations are collected per day; partitions are sets of days
+    days = {}
+    for record in records:
+        day = parse_date(record[date_field_name])
+        days.setdefault(day, ([], []))[1].append(("POST", record))
+
+    # Existing rows, grouped by partition (one paged query for the whole range)
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "OData-MaxVersion": "4.0",
+        "OData-Version": "4.0",
+        "Accept": "application/json"
+    }
+
+    primary_key_field = get_primary_key_field(token, table_name)
+    filter_query = f"?$filter={date_field_name} ge '{start_date}' and {date_field_name} le '{end_date}'&$select={primary_key_field},{date_field_name}"
+    url = f"{DATAVERSE_URL}/api/data/v9.2/{table_name}{filter_query}"
+
+    existing_count = 0
+    try:
+        for record in iter_query_records(url, headers):
+            # Date-only columns come back as YYYY-MM-DD, datetimes with a time suffix
+            day = record[date_field_name][:10]
+            days.setdefault(day, ([], []))[0].append(("DELETE", record[primary_key_field]))
+            existing_count += 1
+    except RuntimeError as e:
+        logger.error(str(e))
+        return False
+
+    partitions = {}
+    for day in days:
+        partitions.setdefault(partition_key(day, partition), []).append(day)
+
+    logger.info(f"Found {existing_count} existing and {len(records)} new records in {len(partitions)} partitions")
+
+    if not partitions:
+        logger.info("Nothing to replace")
+        return True
+
+    # One changeset per partition, or per day for partitions too large for one request
+    changesets = []
+    for key in sorted(partitions):
+        partition_days = sorted(partitions[key])
+        deletes = [operation for day in partition_days for operation in days[day][0]]
+        posts = [operation for day in partition_days for operation in days[day][1]]
+        if len(deletes) + len(posts) <= MAX_BATCH_OPERATIONS and len(posts) <= BATCH_SIZE:
+            changesets.append((key, deletes + posts, len(posts)))
+            continue
+
+        for day in partition_days:
+            deletes, posts = days[day]
+            if len(deletes) + len(posts) <= MAX_BATCH_OPERATIONS:
+                # Alone in its request if it has more than BATCH_SIZE new rows, but still atomic
+                changesets.append((key, deletes + posts, len(posts)))
+                continue
+
+            logger.warning(f"  Day {day} has {len(deletes) + len(posts)} operations; "
+                           f"splitting it across batches (not atomic)")
+            for i in range(0, len(deletes), MAX_BATCH_OPERATIONS):
+                changesets.append((key, deletes[i:i + MAX_BATCH_OPERATIONS], 0))
+            for i in range(0, len(posts), BATCH_SIZE):
+                chunk = posts[i:i + BATCH_SIZE]
+                changesets.append((key, chunk, len(chunk)))
+
+    # Pack changesets into as few $batch requests as the limits allow
+    batches = []
+    batch_changesets, keys, operation_count, post_count = [], [], 0, 0
+    for key, operations, posts in changesets:
+        if batch_changesets and (operation_count + len(operations) > MAX_BATCH_OPERATIONS
+                                 or post_count + posts > BATCH_SIZE):
+            batches.append((batch_changesets, keys))
+            batch_changesets, keys, operation_count, post_count = [], [], 0, 0
+
+        batch_changesets.append(operations)
+        keys.append(key)
+        operation_count += len(operations)
+        post_count += posts
+
+    if batch_changesets:
+        batches.append((batch_changesets, keys))
+
+    # Send each batch
+    replaced_partitions = set()
+    failed_partitions = set()
+    for number, (batch_changesets, keys) in enumerate(batches, 1):
+        batch_id, batch_body = build_batch_body(batch_changesets, table_name)
+        response = post_batch(token, batch_id, batch_body)
+
+        if batch_succeeded(response):
+            replaced_partitions.update(keys)
+            logger.info("  Replaced batch %d/%d: partitions %s..%s",
+                        number, len(batches), keys[0], keys[-1], extra=SAMPLED)
+        else:
+            failed_partitions.update(keys)
+            logger.error(f"  Error replacing batch {number}: {response.status_code} - {response.text[:500]}")
+
+    replaced_partitions -= failed_partitions
+    logger.info(f"✓ Replaced {len(replaced_partitions)} partitions in table '{table_name}' "
+                f"using {len(batches)} batch requests")
+    if failed_partitions:
+        logger.error(f"Failed partitions: {', '.join(sorted(failed_partitions))}")
+    return not failed_partitions
@@ -0,0 +1,255 @@
+"""
+Dataverse table metadata
+Fetches EntityDefinitions for a table once, caches it on disk with a TTL,
+and uses it to find the primary key and to validate/coerce records locally
+before they are sent.
+"""
+
+import json
+import threading
+import time
+from urllib.parse import urlparse
+from config import (
+    DATAVERSE_URL,
+    TABLE_NAME,
+    METADATA_CACHE_DIR,
+    METADATA_CACHE_TTL_HOURS
+)
+from logger import get_logger
+from rate_limiter import send_throttled
+
+
+# Attribute metadata subtypes that carry length/precision/range details
+ATTRIBUTE_CASTS = {
+    "StringAttributeMetadata": "LogicalName,MaxLength",
+    "MemoAttributeMetadata": "LogicalName,MaxLength",
+    "DecimalAttributeMetadata": "LogicalName,Precision,MinValue,MaxValue",
+    "DoubleAttributeMetadata": "LogicalName,Precision,MinValue,MaxValue",
+    "MoneyAttributeMetadata": "LogicalName,Precision,MinValue,MaxValue",
+    "IntegerAttributeMetadata": "LogicalName,MinValue,MaxValue",
+    "DateTimeAttributeMetadata": "LogicalName,Format",
+}
+
+TEXT_TYPES = ("String", "Memo")
+NUMBER_TYPES = ("Decimal", "Double", "Money")
+INTEGER_TYPES = ("Integer", "BigInt")
+
+# Maximum number of validation errors written to the log per call
+MAX_LOGGED_ERRORS = 20
+
+_memory_cache = {}
+_cache_lock = threading.Lock()
+
+
+def _get_json(token, url):
+    """GET a Dataverse metadata URL and return the parsed JSON body"""
+    from dataverse_client import get_session
+
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "OData-MaxVersion": "4.0",
+        "OData-Version": "4.0",
+        "Accept": "application/json"
+    }
+    response = send_throttled(lambda: get_session().get(url, headers=headers))
+    if response.status_code != 200:
+        raise RuntimeError(f"Metadata request failed: {response.status_code} - {response.text[:500]}")
+    return response.json()
+
+
+def _org_host():
+    """Host of DATAVERSE_URL, so each environment (dev, prod, ...) gets its own cache"""
+    return urlparse(DATAVERSE_URL).netloc.lower() or "default"
+
+
+def fetch_entity_metadata(token, table_name):
+    """
+    Fetch table and column metadata from Dataverse
+
+    Args:
+        token: Access token
+        table_name: Entity set name of the table (e.g. cr834_eacdataraws)
+
+    Returns:
+        Dict with logical_name, entity_set_name, primary_id_attribute and
+        attributes ({logical_name: {type, max_length, precision, min_value, max_value, format}})
+    """
+    base = f"{DATAVERSE_URL}/api/data/v9.2/EntityDefinitions"
+
+    entities = _get_json(token, f"{base}?$filter=EntitySetName eq '{table_name}'"
+                                f"&$select=LogicalName,EntitySetName,PrimaryIdAttribute").get('value', [])
+    if not entities:
+        raise RuntimeError(f"Table '{table_name}' not found in EntityDefinitions")
+
+    entity = entities[0]
+    attributes_url = f"{base}(LogicalName='{entity['LogicalName']}')/Attributes"
+
+    attributes = {}
+    for attribute in _get_json(token, f"{attributes_url}?$select=LogicalName,AttributeType").get('value', []):
+        attributes[attribute["LogicalName"]] = {"type": attribute["AttributeType"]}
+
+    for cast, select in ATTRIBUTE_CASTS.items():
+        url = f"{attributes_url}/Microsoft.Dynamics.CRM.{cast}?$select={select}"
+        for attribute in _get_json(token, url).get('value', []):
+            details = attributes.setdefault(attribute["LogicalName"], {"type": cast.replace("AttributeMetadata", "")})
+            details["max_length"] = attribute.get("MaxLength")
+            details["precision"] = attribute.get("Precision")
+            details["min_value"] = attribute.get("MinValue")
+            details["max_value"] = attribute.get("MaxValue")
+            details["format"] = attribute.get("Format")
+
+    return {
+        "logical_name": entity["LogicalName"],
+        "entity_set_name": entity["EntitySetName"],
+        "primary_id_attribute": entity["PrimaryIdAttribute"],
+        "attributes": attributes
+    }
+
+
+def get_entity_metadata(token, table_name=None, refresh=False):
+    """
+    Return table metadata, from memory, the disk cache, or Dataverse
+
+    The disk cache lives in METADATA_CACHE_DIR, is keyed by org host and
+    table, and expires after METADATA_CACHE_TTL_HOURS.
+
+    Args:
+        token: Access token (only used on a cache miss)
+        table_name: Entity set name (default: TABLE_NAME from config)
+        refresh: Ignore any cached copy
+    """
+    logger = get_logger()
+
+    if table_name is None:
+        table_name = TABLE_NAME
+
+    host = _org_host()
+    cache_key = (host, table_name)
+    cache_file = METADATA_CACHE_DIR / f"metadata_{host.replace(':', '_')}_{table_name}.json"
+
+    ttl_seconds = METADATA_CACHE_TTL_HOURS * 3600
+
+    with _cache_lock:
+        if not refresh and cache_key in _memory_cache:
+            loaded_at, metadata = _memory_cache[cache_key]
+            if time.time() - loaded_at < ttl_seconds:
+                return metadata
+
+        if not refresh and cache_file.exists():
+            fetched_at = cache_file.stat().st_mtime
+            if time.time() - fetched_at < ttl_seconds:
+                with open(cache_file, 'r', encoding='utf-8') as f:
+                    metadata = json.load(f)
+                _memory_cache[cache_key] = (fetched_at, metadata)
+                return metadata
+
+        logger.info(f"Fetching table metadata for '{table_name}'...")
+        metadata = fetch_entity_metadata(token, table_name)
+
+        METADATA_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2)
+
+        _memory_cache[cache_key] = (time.time(), metadata)
+        return metadata
+
+
+def get_primary_key_field(token, table_name=None):
+    """Return the primary id column of a table (e.g. cr834_eacdatarawid)"""
+    return get_entity_metadata(token, table_name)["primary_id_attribute"]
+
+
+def coerce_value(value, attribute):
+    """
+    Coerce one value to the column's type
+
+    Returns:
+        Tuple of (coerced_value, error_message or None)
+    """
+    if value is None:
+        return None, None
+
+    attribute_type = attribute["type"]
+
+    if attribute_type in TEXT_TYPES:
+        value = str(value)
+        max_length = attribute.get("max_length")
+        if max_length and len(value) > max_length:
+            return value, f"length {len(value)} exceeds max {max_length}"
+        return value, None
+
+    if attribute_type in NUMBER_TYPES or attribute_type in INTEGER_TYPES:
+        try:
+            number = int(value) if attribute_type in INTEGER_TYPES else float(value)
+        except (ValueError, TypeError):
+            return value, f"'{value}' is not a valid {attribute_type}"
+
+        if attribute.get("precision") is not None:
+            number = round(number, attribute["precision"])
+        if attribute.get("min_value") is not None and number < attribute["min_value"]:
+            return number, f"{number} is below min {attribute['min_value']}"
+        if attribute.get("max_value") is not None and number > attribute["max_value"]:
+            return number, f"{number} is above max {attribute['max_value']}"
+        return number, None
+
+    if attribute_type == "DateTime":
+        from dataverse_client import parse_date
+
+        parsed = parse_date(str(value))
+        if parsed is None:
+            return value, f"'{value}' is not a valid date"
+        return parsed, None
+
+    return value, None
+
+
+def validate_record(record, metadata):
+    """
+    Validate and coerce a record against table metadata
+
+    Values are coerced in place, so validating a large record list does not
+    make a second copy of it.
+
+    Returns:
+        Tuple of (record, list of error messages)
+    """
+    attributes = metadata["attributes"]
+    errors = []
+
+    for name, value in record.items():
+        attribute = attributes.get(name)
+        if attribute is None:
+            errors.append(f"{name}: column does not exist")
+            continue
+
+        record[name], error = coerce_value(value, attribute)
+        if error:
+            errors.append(f"{name}: {error}")
+
+    return record, errors
+
+
+def validate_records(records, metadata):
+    """
+    Validate a list of records, dropping the ones Dataverse would reject
+
+    Returns:
+        List of coerced (in place), valid records
+    """
+    logger = get_logger()
+
+    valid = []
+    rejected = 0
+    for index, record in enumerate(records):
+        coerced, errors = validate_record(record, metadata)
+        if errors:
+            rejected += 1
+            if rejected <= MAX_LOGGED_ERRORS:
+                logger.warning(f"  Skipping record {index + 1}: {'; '.join(errors)}")
+            continue
+        valid.append(coerced)
+
+    if rejected:
+        logger.warning(f"Skipped {rejected} records that failed validation against '{metadata['entity_set_name']}'")
+
+    return valid
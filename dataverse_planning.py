@@ -0,0 +1,250 @@
+"""
+Pre-flight planning for Dataverse operations
+Counts matching rows with server-side aggregation ($apply) instead of paging
+through every primary key, and estimates how long an operation will take.
+"""
+
+import math
+from collections import OrderedDict
+from dataverse_client import get_dataverse_token, get_session, DELETE_BATCH_SIZE
+from config import (
+    DATAVERSE_URL,
+    TABLE_PREFIX,
+    TABLE_NAME,
+    BATCH_SIZE,
+    ESTIMATED_SECONDS_PER_BATCH
+)
+from logger import get_logger
+from rate_limiter import send_throttled
+
+
+def date_filter(date_field_name, start_date=None, end_date=None, after_date=None):
+    """
+    Build an OData filter expression on a date column
+
+    Args:
+        date_field_name: Date column to filter on
+        start_date: Inclusive start date (YYYY-MM-DD)
+        end_date: Inclusive end date (YYYY-MM-DD)
+        after_date: Exclusive lower bound (YYYY-MM-DD), as used by delete_records_after_date
+    """
+    clauses = []
+    if after_date:
+        clauses.append(f"{date_field_name} gt '{after_date}'")
+    if start_date:
+        clauses.append(f"{date_field_name} ge '{start_date}'")
+    if end_date:
+        clauses.append(f"{date_field_name} le '{end_date}'")
+    return " and ".join(clauses)
+
+
+def _get_json(token, url):
+    """GET a Dataverse URL and return the parsed JSON body"""
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "OData-MaxVersion": "4.0",
+        "OData-Version": "4.0",
+        "Accept": "application/json"
+    }
+    response = send_throttled(lambda: get_session().get(url, headers=headers))
+    if response.status_code != 200:
+        raise RuntimeError(f"Aggregate query failed: {response.status_code} - {response.text[:500]}")
+    return response.json()
+
+
+def aggregate_by_day(token, filter_expression, measure_fields=(), date_field_name=None, table_name=None):
+    """
+    Row count and column sums per day with a single groupby/aggregate request
+
+    Args:
+        token: Access token
+        filter_expression: OData filter (see date_filter())
+        measure_fields: Numeric columns to sum
+        date_field_name: Date column to group by (default: {TABLE_PREFIX}_date)
+        table_name: Target table (default: TABLE_NAME from config)
+
+    Returns:
+        OrderedDict of {YYYY-MM-DD: {"row_count": n, field: total, ...}}, sorted by date
+    """
+    if table_name is None:
+        table_name = TABLE_NAME
+    if date_field_name is None:
+        date_field_name = f"{TABLE_PREFIX}_date"
+
+    aggregates = ["$count as row_count"] + [f"{field} with sum as sum_{index}"
+                                           for index, field in enumerate(measure_fields)]
+    apply = f"groupby(({date_field_name}),aggregate({','.join(aggregates)}))"
+    if filter_expression:
+        apply = f"filter({filter_expression})/{apply}"
+    url = f"{DATAVERSE_URL}/api/data/v9.2/{table_name}?$apply={apply}"
+
+    days = {}
+    for row in _get_json(token, url).get('value', []):
+        day = (row.get(date_field_name) or "")[:10] or "(no date)"
+        totals = days.setdefault(day, dict.fromkeys(["row_count"] + list(measure_fields), 0))
+        totals["row_count"] += int(row["row_count"])
+        for index, field in enumerate(measure_fields):
+            totals[field] += float(row.get(f"sum_{index}") or 0)
+
+    return OrderedDict(sorted(days.items()))
+
+
+def _edge_date(token, filter_expression, date_field_name, table_name, direction):
+    """First ('asc') or last ('desc') date among matching rows, via a one-row query"""
+    url = f"{DATAVERSE_URL}/api/data/v9.2/{table_name or TABLE_NAME}?$select={date_field_name}&$orderby={date_field_name} {direction}&$top=1"
+    if filter_expression:
+        url += f"&$filter={filter_expression} and {date_field_name} ne null"
+    else:
+        url += f"&$filter={date_field_name} ne null"
+
+    value = _get_json(token, url).get('value', [])
+    return value[0][date_field_name][:10] if value else None
+
+
+def aggregate_date_range(token, start_date, end_date, measure_fields=(), date_field_name=None, table_name=None,
+                         after_date=None):
+    """
+    aggregate_by_day() over a date range of any size
+
+    Dataverse refuses to aggregate over more than 50,000 rows, so ranges
+    that hit the limit are split into months, and months into days. Open
+    bounds (start_date or end_date None) are closed at the first / last
+    date in the table before splitting.
+
+    Args:
+        start_date / end_date / after_date: Date bounds, see date_filter()
+    """
+    if date_field_name is None:
+        date_field_name = f"{TABLE_PREFIX}_date"
+
+    filter_expression = date_filter(date_field_name, start_date, end_date, after_date)
+    try:
+        return aggregate_by_day(token, filter_expression, measure_fields, date_field_name, table_name)
+    except RuntimeError as e:
+        if "AggregateQueryRecordLimit" not in str(e) or (start_date is not None and start_date == end_date):
+            raise
+
+    lower = start_date or _edge_date(token, filter_expression, date_field_name, table_name, "asc")
+    upper = end_date or _edge_date(token, filter_expression, date_field_name, table_name, "desc")
+    if lower is None or upper is None:
+        return OrderedDict()
+    if lower == upper:
+        # A single day above the limit cannot be split any further
+        return aggregate_date_range(token, lower, upper, measure_fields, date_field_name, table_name, after_date)
+
+    get_logger().info("Too many rows for one aggregate query, splitting %s to %s...", lower, upper)
+    months = list(_month_ranges(lower, upper))
+    if len(months) > 1:
+        spans = months
+    else:
+        spans = [(day, day) for day in _day_range(lower, upper)]
+
+    days = OrderedDict()
+    for span_start, span_end in spans:
+        days.update(aggregate_date_range(token, span_start, span_end, measure_fields, date_field_name, table_name,
+                                         after_date))
+    return days
+
+
+def _month_ranges(start_date, end_date):
+    """Split an inclusive YYYY-MM-DD range into (first, last) day pairs per calendar month"""
+    from datetime import datetime, timedelta
+
+    current = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    while current <= end:
+        next_month = (current.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(next_month - timedelta(days=1), end)
+        yield current.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")
+        current = next_month
+
+
+def _day_range(start_date, end_date):
+    """Every YYYY-MM-DD day in an inclusive range"""
+    from datetime import datetime, timedelta
+
+    current = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    while current <= end:
+        yield current.strftime("%Y-%m-%d")
+        current += timedelta(days=1)
+
+
+def group_by_month(day_counts):
+    """Fold {YYYY-MM-DD: count} into {YYYY-MM: count}"""
+    months = OrderedDict()
+    for day, count in day_counts.items():
+        month = day[:7]
+        months[month] = months.get(month, 0) + count
+    return months
+
+
+def estimate_operation(row_count, batch_size, seconds_per_batch=None):
+    """
+    Estimate the number of $batch requests and minutes an operation will take
+
+    Args:
+        row_count: Number of rows the operation touches
+        batch_size: Rows per $batch request
+        seconds_per_batch: Observed time per batch (default: ESTIMATED_SECONDS_PER_BATCH)
+
+    Returns:
+        Dict with 'batches' and 'minutes'
+    """
+    if seconds_per_batch is None:
+        seconds_per_batch = ESTIMATED_SECONDS_PER_BATCH
+
+    batches = math.ceil(row_count / batch_size) if row_count else 0
+    return {
+        "batches": batches,
+        "minutes": round(batches * seconds_per_batch / 60, 1)
+    }
+
+
+def plan_delete(start_date=None, end_date=None, after_date=None, date_field_name=None,
+                table_name=None, table_prefix=None, token=None):
+    """
+    Plan a delete without fetching any primary keys
+
+    Args:
+        start_date / end_date / after_date: Date bounds, see date_filter()
+        date_field_name: Date column (default: {prefix}_date)
+        table_name: Target table (default: TABLE_NAME from config)
+        table_prefix: Column prefix (default: TABLE_PREFIX from config)
+        token: Optional access token to reuse instead of authenticating
+
+    Returns:
+        Dict with 'total', 'by_month', 'batches' and 'minutes'
+    """
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
+    if date_field_name is None:
+        date_field_name = f"{table_prefix}_date"
+    if token is None:
+        token = get_dataverse_token()
+
+    # Split above the 50,000-row aggregate limit; with only after_date the range
+    # stays open-ended, so future-dated rows are counted as they would be deleted
+    days = aggregate_date_range(token, start_date, end_date, (), date_field_name, table_name, after_date)
+    by_day = OrderedDict((day, totals["row_count"]) for day, totals in days.items())
+
+    total = sum(by_day.values())
+
+    plan = {"total": total, "by_month": group_by_month(by_day)}
+    plan.update(estimate_operation(total, DELETE_BATCH_SIZE))
+    return plan
+
+
+def plan_upload(row_count):
+    """Estimate batches and minutes for uploading row_count rows"""
+    return estimate_operation(row_count, BATCH_SIZE)
+
+
+def log_plan(plan, action="delete"):
+    """Log a plan from plan_delete() as a per-month table"""
+    logger = get_logger()
+
+    logger.info(f"Rows that would be affected: {plan['total']}")
+    for month, count in plan["by_month"].items():
+        logger.info(f"  {month}: {count}")
+    logger.info(f"Estimated {action}: {plan['batches']} batch requests, ~{plan['minutes']} minutes")
@@ -0,0 +1,98 @@
+"""
+Duplicate row detection for downloaded reports
+
+Unanet exports can repeat a timesheet line exactly, or contain superseded
+versions of it (e.g. an adjustment with a different ADJPostedDate). Rows
+with the same identity (DEDUP_KEY_COLUMNS, default: every column) are
+collapsed before upload:
+
+    last   the later row replaces the earlier ones
+    sum    hours and amounts are added up into one row (other values: last row)
+
+Records stream through a window of at most DEDUP_WINDOW distinct rows,
+evicting the least recently seen first, so memory stays bounded. Duplicates
+further apart than the window are not collapsed.
+"""
+
+from collections import OrderedDict
+from dataverse_client import CSV_COLUMNS, DECIMAL_COLUMNS
+from config import DEDUP_POLICY, DEDUP_KEY_COLUMNS, DEDUP_WINDOW
+from logger import get_logger
+
+
+# Additive columns for the 'sum' policy (rates are not additive)
+SUM_COLUMNS = [column for column in CSV_COLUMNS if column in DECIMAL_COLUMNS and column != "BillRateBC"]
+
+
+def _key_fields(key_columns):
+    """Record attribute names for a list of CSV identity columns"""
+    unknown = [column for column in key_columns if column not in CSV_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown dedup key columns: {', '.join(unknown)}")
+    return [column.lower() for column in key_columns]
+
+
+def _add_measures(target, source, fields):
+    """Add the additive values of source into target"""
+    for field in fields:
+        value = getattr(source, field)
+        if value is not None:
+            current = getattr(target, field)
+            setattr(target, field, round((current or 0.0) + value, 2))
+
+
+def dedupe_records(records, policy=None, key_columns=None, window=None):
+    """
+    Collapse duplicate records, yielding the survivors
+
+    Args:
+        records: Iterable of DataverseRecord (e.g. from iter_csv_records)
+        policy: 'last' or 'sum' (default: DEDUP_POLICY from config)
+        key_columns: CSV columns that identify a row (default: DEDUP_KEY_COLUMNS,
+            or every column if that is empty)
+        window: Maximum distinct rows held at once (default: DEDUP_WINDOW)
+    """
+    logger = get_logger()
+
+    if policy is None:
+        policy = DEDUP_POLICY
+    if key_columns is None:
+        key_columns = DEDUP_KEY_COLUMNS or list(CSV_COLUMNS)
+    if window is None:
+        window = DEDUP_WINDOW
+
+    if policy not in ("last", "sum"):
+        raise ValueError(f"Unknown dedup policy: {policy}")
+
+    key_fields = _key_fields(key_columns)
+    sum_fields = [column.lower() for column in SUM_COLUMNS if column not in key_columns]
+
+    pending = OrderedDict()
+    seen = collapsed = evicted = 0
+
+    for record in records:
+        seen += 1
+        key = tuple(getattr(record, field) for field in key_fields)
+
+        kept = pending.get(key)
+        if kept is not None:
+            collapsed += 1
+            if policy == "sum":
+                # The later row survives, carrying the running totals
+                _add_measures(record, kept, sum_fields)
+            pending[key] = record
+            pending.move_to_end(key)
+            continue
+
+        pending[key] = record
+        if len(pending) > window:
+            evicted += 1
+            yield pending.popitem(last=False)[1]
+
+    yield from pending.values()
+
+    logger.info(f"Dedup ({policy}): collapsed {collapsed} duplicate rows, "
+                f"{seen - collapsed} of {seen} rows kept")
+    if evicted:
+        logger.info(f"  Dedup window of {window} rows was full {evicted} times; "
+                    f"duplicates further apart were not collapsed")
@@ -3,6 +3,8 @@ Delete records from Dataverse table based on date filter
 """
 
 from dataverse_client import delete_records_after_date
+from dataverse_planning import plan_delete, log_plan
+from config import USE_ASYNC_CLIENT
 from logger import setup_logger, get_logger
 import sys
 
@@ -19,6 +21,9 @@ def main():
 
     date_string = sys.argv[1]
 
+    # Show what would be deleted (aggregate query, no records fetched)
+    log_plan(plan_delete(after_date=date_string))
+
     # Confirm before deleting
     logger.warning(f"WARNING: This will delete ALL records with date > {date_string}")
     response = input("Are you sure you want to continue? (yes/no): ")
@@ -27,7 +32,13 @@ def main():
         logger.info("Deletion cancelled")
         return
 
-    delete_records_after_date(date_string)
+    if USE_ASYNC_CLIENT:
+        import asyncio
+        from async_dataverse_client import delete_records_after_date_async
+
+        asyncio.run(delete_records_after_date_async(date_string))
+    else:
+        delete_records_after_date(date_string)
 
 
 if __name__ == "__main__":
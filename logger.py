@@ -1,55 +1,265 @@
 """
 Logging configuration for Unanet to Dataverse Integration
 Logs to both console and file
+
+Callers only put records on a queue; a background QueueListener thread does
+the formatting and file/console I/O, so slow disks or terminals never stall
+upload and delete workers. Per-batch progress lines are marked with
+extra=SAMPLED and can be thinned out for very large runs.
 """
 
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import re
 import sys
-from pathlib import Path
+import threading
+import time
 from datetime import datetime
-from config import PROJECT_DIR
+from pathlib import Path
+from config import (
+    PROJECT_DIR,
+    LOG_FORMAT,
+    LOG_ROTATION,
+    LOG_MAX_BYTES,
+    LOG_BACKUP_COUNT,
+    LOG_ROTATE_WHEN,
+    LOG_SAMPLE_EVERY,
+    LOG_SAMPLE_INTERVAL
+)
+
+
+# Pass as extra= on high-volume progress lines (per batch / per page)
+SAMPLED = {"sample": True}
+
+_listener = None
+
+# Lock held on the log file this process writes, released by stop_logging()
+_log_lock = None
+
+# Files written by a single run or process (unanet_sync_<run or command>_<pid>.log)
+_RUN_LOG_NAME = re.compile(r"^unanet_sync_.+_\d+\.log$")
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line
+
+    Tracebacks are already folded into the message by the QueueHandler.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class SampleFilter(logging.Filter):
+    """
+    Thin out records logged with extra=SAMPLED
+
+    A sampled record passes if it is the Nth since the last one that passed
+    (LOG_SAMPLE_EVERY) or if LOG_SAMPLE_INTERVAL seconds have gone by.
+    Warnings, errors and unmarked records always pass.
+    """
+
+    def __init__(self, every, interval):
+        super().__init__()
+        self.every = max(1, every)
+        self.interval = interval
+        # Let the first sampled record through
+        self.skipped = self.every - 1
+        self.last_passed = 0.0
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        if not getattr(record, "sample", False) or record.levelno >= logging.WARNING:
+            return True
+
+        with self.lock:
+            now = time.monotonic()
+            due = self.skipped + 1 >= self.every
+            if self.interval and now - self.last_passed >= self.interval:
+                due = True
+            if due:
+                self.skipped = 0
+                self.last_passed = now
+                return True
+            self.skipped += 1
+            return False
+
+
+def _lock_file(path):
+    """
+    Take a non-blocking exclusive lock on <path>.lock
+
+    Returns:
+        The open lock file (keep it open to hold the lock), or None if
+        another process holds it
+    """
+    handle = open(f"{path}.lock", "a+")
+    try:
+        if os.name == "nt":
+            import msvcrt
+
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return None
+    return handle
+
+
+def _command_name():
+    """Name of the running command, e.g. 'cli' or 'main'"""
+    return Path(sys.argv[0]).stem if sys.argv and sys.argv[0] else "python"
+
+
+def _open_log_file(logs_dir):
+    """
+    Pick this process's log file and lock it
+
+    With size/time rotation each command writes and rotates one file,
+    logs/unanet_sync_<command>.log. The rotating handlers are not safe with
+    several processes writing one file (rollover fails on Windows while
+    another process has it open, and lines are lost elsewhere), so only the
+    process holding its lock writes it; a second process of the same
+    command running at the same time falls back to
+    unanet_sync_<command>_<pid>.log.
+
+    Returns:
+        Tuple of (log file path, rotate it?, lock handle or None)
+    """
+    if LOG_ROTATION in ("size", "time"):
+        path = logs_dir / f"unanet_sync_{_command_name()}.log"
+        lock = _lock_file(path)
+        if lock is not None:
+            return path, True, lock
+        path = logs_dir / f"unanet_sync_{_command_name()}_{os.getpid()}.log"
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        path = logs_dir / f"unanet_sync_{timestamp}_{os.getpid()}.log"
+    return path, False, _lock_file(path)
+
+
+def _prune_run_logs(logs_dir, keep):
+    """
+    Delete all but the newest `keep` per-run / per-process log files
+
+    Files still locked by a running process are left alone. Backups of the
+    per-command files are pruned by their rotating handler instead.
+    """
+    files = sorted((path for path in logs_dir.glob("unanet_sync_*.log") if _RUN_LOG_NAME.match(path.name)),
+                   key=lambda path: path.stat().st_mtime, reverse=True)
+
+    for path in files[keep:]:
+        lock = _lock_file(path)
+        if lock is None:
+            continue
+        try:
+            path.unlink(missing_ok=True)
+        except OSError:
+            pass
+        finally:
+            lock.close()
+        Path(f"{path}.lock").unlink(missing_ok=True)
+
+
+def _create_file_handler(logs_dir):
+    """Create the file handler for LOG_ROTATION and prune old run logs"""
+    global _log_lock
+
+    path, rotate, _log_lock = _open_log_file(logs_dir)
+    # Created first, so this run's file counts towards the ones kept
+    path.touch()
+    _prune_run_logs(logs_dir, max(1, LOG_BACKUP_COUNT))
+
+    if rotate and LOG_ROTATION == "time":
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=LOG_ROTATE_WHEN, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    if rotate:
+        return logging.handlers.RotatingFileHandler(
+            path, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding='utf-8')
+    return logging.FileHandler(path, encoding='utf-8')
+
+
+def stop_logging():
+    """Flush queued records and stop the background listener"""
+    global _listener, _log_lock
+
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+    if _log_lock is not None:
+        _log_lock.close()
+        _log_lock = None
 
 
 def setup_logger():
     """
     Set up logging to both console and file
-    Creates logs directory and dated log files
+    Creates logs directory and a rotating log file
     """
+    global _listener
+
     # Create logs directory
     logs_dir = PROJECT_DIR / "logs"
     logs_dir.mkdir(exist_ok=True)
 
-    # Create log filename with timestamp
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file = logs_dir / f"unanet_sync_{timestamp}.log"
-
     # Create logger
     logger = logging.getLogger("UnanetSync")
     logger.setLevel(logging.INFO)
 
     # Remove existing handlers to avoid duplicates
     logger.handlers.clear()
+    stop_logging()
 
     # Create formatters
-    detailed_formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+    if LOG_FORMAT == "json":
+        detailed_formatter = JsonFormatter()
+    else:
+        detailed_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
     simple_formatter = logging.Formatter('%(message)s')
 
     # File handler (detailed)
-    file_handler = logging.FileHandler(log_file, encoding='utf-8')
+    file_handler = _create_file_handler(logs_dir)
     file_handler.setLevel(logging.INFO)
     file_handler.setFormatter(detailed_formatter)
-    logger.addHandler(file_handler)
 
     # Console handler (simple)
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
     console_handler.setFormatter(simple_formatter)
-    logger.addHandler(console_handler)
 
-    logger.info(f"Logging initialized. Log file: {log_file}")
+    # Callers enqueue; the listener thread formats and writes
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SampleFilter(LOG_SAMPLE_EVERY, LOG_SAMPLE_INTERVAL))
+    logger.addHandler(queue_handler)
+
+    _listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+
+    logger.info(f"Logging initialized. Log file: {file_handler.baseFilename}")
 
     return logger
 
@@ -57,3 +267,6 @@ def setup_logger():
 def get_logger():
     """Get the configured logger instance"""
     return logging.getLogger("UnanetSync")
+
+
+atexit.register(stop_logging)
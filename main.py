@@ -6,22 +6,79 @@ Workflow:
 1. Download report from Unanet (or use cached version)
 2. Delete existing records from the past year
 3. Upload only records from the past year from the CSV
+
+With SYNC_MODE=replace, steps 2 and 3 are done together one partition at a
+time so the table is never empty mid-sync. With VERIFY_AFTER_SYNC, the
+result is checked against the report afterwards (see reconcile.py).
+
+If a jobs file (SYNC_JOBS_FILE) exists, every job in it is run through the
+multi-report orchestrator instead.
+
+Run with --profile to write per-phase cProfile, flame graph and allocation
+output to logs/profile_sync_<timestamp>/ (see profiling.py).
 """
 
+import argparse
+
 from datetime import datetime, timedelta
 from unanet_downloader import download_report
-from dataverse_client import upload_to_dataverse, delete_records_in_date_range
-from config import DATAVERSE_USERNAME, DATAVERSE_PASSWORD
-from logger import setup_logger
+from dataverse_client import upload_to_dataverse, delete_records_in_date_range, replace_records_in_date_range
+from config import (
+    DATAVERSE_USERNAME,
+    DATAVERSE_PASSWORD,
+    SYNC_JOBS_FILE,
+    USE_ASYNC_CLIENT,
+    SYNC_MODE,
+    ARCHIVE_ENABLED,
+    ROLLUP_TABLE_NAME,
+    VERIFY_AFTER_SYNC
+)
+from logger import setup_logger, get_logger
+from profiling import start_profiling, stop_profiling, profile_phase
+
 
+def main(setup_logging=True, browser_context=None, force_download=False, profile=False):
+    """
+    Main entry point for the application
 
-def main():
-    """Main entry point for the application"""
+    Args:
+        setup_logging: Configure logging (False when the caller already did)
+        browser_context: Optional open Playwright context for the download
+            (the sync daemon keeps one warm; not used for jobs files)
+        force_download: Download the report again even if today's file exists
+        profile: Profile each phase of the run (see profiling.py)
+    """
     # Initialize logger
-    logger = setup_logger()
+    logger = setup_logger() if setup_logging else get_logger()
 
+    if profile:
+        start_profiling("sync")
+        try:
+            return _run(logger, browser_context, force_download)
+        finally:
+            stop_profiling()
+
+    return _run(logger, browser_context, force_download)
+
+
+def _run(logger, browser_context, force_download):
+    """Run the sync workflow, one profiling phase per step"""
     logger.info("=== Unanet to Dataverse Integration ===")
 
+    if SYNC_JOBS_FILE.exists():
+        from orchestrator import load_jobs, run_jobs
+
+        logger.info(f"Found jobs file: {SYNC_JOBS_FILE}")
+        if not (DATAVERSE_USERNAME and DATAVERSE_PASSWORD):
+            logger.warning("Skipping Dataverse sync - credentials not configured")
+            return
+        with profile_phase("jobs"):
+            failed = run_jobs(load_jobs(SYNC_JOBS_FILE), force_download=force_download)
+        if failed:
+            raise RuntimeError(f"Sync jobs failed: {', '.join(failed)}")
+        logger.info("=== Process Complete ===")
+        return
+
     try:
         # Calculate date range (past year from today)
         today = datetime.now()
@@ -34,18 +91,59 @@ def main():
         logger.info(f"Processing records from the past 365 days")
 
         # Step 1: Download the report from Unanet (or use today's existing file)
-        csv_path = download_report()
+        with profile_phase("download"):
+            csv_path = download_report(browser_context=browser_context, force=force_download,
+                                       start_date=one_year_ago_str, end_date=today_str)
+
+        # Keep a compressed, month-partitioned copy; uploads read from it
+        if ARCHIVE_ENABLED:
+            from report_archive import archive_report, apply_retention
+
+            with profile_phase("archive"):
+                archive_report(csv_path)
+                apply_retention()
 
         # Step 2: Upload to Dataverse if credentials are configured
-        if DATAVERSE_USERNAME and DATAVERSE_PASSWORD:
-            # Delete existing records in the date range
-            delete_records_in_date_range(one_year_ago_str, today_str)
+        with profile_phase("sync"):
+            if DATAVERSE_USERNAME and DATAVERSE_PASSWORD and SYNC_MODE == "replace":
+                # Swap each partition atomically instead of emptying the whole window first
+                if not replace_records_in_date_range(csv_path, one_year_ago_str, today_str):
+                    raise RuntimeError("one or more partitions could not be replaced")
+            elif DATAVERSE_USERNAME and DATAVERSE_PASSWORD and USE_ASYNC_CLIENT:
+                import asyncio
+                from async_dataverse_client import sync_date_range_async
+
+                # Same delete + upload, with batches sent concurrently
+                if not asyncio.run(sync_date_range_async(csv_path, one_year_ago_str, today_str)):
+                    raise RuntimeError("async sync failed: a delete or upload batch failed, or rows were skipped")
+            elif DATAVERSE_USERNAME and DATAVERSE_PASSWORD:
+                # Delete existing records in the date range; uploading on top of
+                # rows that were not deleted would duplicate them
+                if not delete_records_in_date_range(one_year_ago_str, today_str):
+                    raise RuntimeError("one or more delete batches failed; upload skipped")
+
+                # Upload records from CSV (only those in the date range)
+                if not upload_to_dataverse(csv_path, start_date=one_year_ago_str, end_date=today_str):
+                    raise RuntimeError("one or more upload batches failed or rows were skipped")
+            else:
+                logger.warning("Skipping Dataverse upload - credentials not configured")
+                logger.warning("Please set DATAVERSE_USERNAME and DATAVERSE_PASSWORD in .env file")
+
+        # Check per-partition counts and sums; re-sync partitions that differ
+        if DATAVERSE_USERNAME and DATAVERSE_PASSWORD and VERIFY_AFTER_SYNC:
+            from reconcile import verify_sync
+
+            with profile_phase("verify"):
+                remaining = verify_sync(csv_path, one_year_ago_str, today_str)
+            if remaining:
+                raise RuntimeError(f"partitions still differ after re-sync: {', '.join(remaining)}")
+
+        # Step 3: Refresh the summary table for reporting consumers
+        if DATAVERSE_USERNAME and DATAVERSE_PASSWORD and ROLLUP_TABLE_NAME:
+            from rollups import sync_rollups
 
-            # Upload records from CSV (only those in the date range)
-            upload_to_dataverse(csv_path, start_date=one_year_ago_str, end_date=today_str)
-        else:
-            logger.warning("Skipping Dataverse upload - credentials not configured")
-            logger.warning("Please set DATAVERSE_USERNAME and DATAVERSE_PASSWORD in .env file")
+            with profile_phase("rollups"):
+                sync_rollups(csv_path, one_year_ago_str, today_str)
 
         logger.info("=== Process Complete ===")
 
@@ -55,4 +153,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Download the Unanet report and sync it to Dataverse")
+    parser.add_argument("--profile", action="store_true",
+                        help="Profile each phase; results go to logs/profile_sync_<timestamp>/")
+    main(profile=parser.parse_args().profile)
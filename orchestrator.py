@@ -0,0 +1,226 @@
+"""
+Multi-report sync orchestrator
+Syncs several Unanet saved reports into several Dataverse tables
+
+Jobs are defined in a JSON file (SYNC_JOBS_FILE, default: jobs.json):
+
+    {
+        "jobs": [
+            {"name": "eac", "report_id": "R_91", "table_name": "cr834_eacdataraws"},
+            {"name": "billing", "report_id": "R_104", "table_name": "cr834_billings",
+             "table_prefix": "cr834", "days": 90}
+        ]
+    }
+
+Downloads run one at a time (each one drives a browser), while the
+delete/upload pipelines of reports that are already downloaded run
+concurrently on a pool of SYNC_MAX_WORKERS threads. Requests to Dataverse
+are capped globally by DATAVERSE_MAX_CONCURRENCY.
+"""
+
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from unanet_downloader import download_report
+from dataverse_client import (
+    get_dataverse_token,
+    upload_to_dataverse,
+    delete_records_in_date_range,
+    replace_records_in_date_range
+)
+from config import (
+    DATAVERSE_USERNAME,
+    DATAVERSE_PASSWORD,
+    TABLE_PREFIX,
+    SYNC_JOBS_FILE,
+    SYNC_MAX_WORKERS,
+    SYNC_MODE,
+    ARCHIVE_ENABLED,
+    VERIFY_AFTER_SYNC
+)
+from logger import setup_logger, get_logger
+
+
+def load_jobs(jobs_file=None):
+    """
+    Load and validate job definitions
+
+    Args:
+        jobs_file: Path to the jobs JSON file (default: SYNC_JOBS_FILE from config)
+
+    Returns:
+        List of job dicts with defaults filled in
+    """
+    if jobs_file is None:
+        jobs_file = SYNC_JOBS_FILE
+
+    with open(jobs_file, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    jobs = []
+    for idx, job in enumerate(data.get("jobs", []), 1):
+        missing = [key for key in ("report_id", "table_name") if not job.get(key)]
+        if missing:
+            raise ValueError(f"Job {idx} in {jobs_file} is missing: {', '.join(missing)}")
+
+        jobs.append({
+            "name": job.get("name") or job["report_id"],
+            "report_id": job["report_id"],
+            "table_name": job["table_name"],
+            "table_prefix": job.get("table_prefix") or TABLE_PREFIX,
+            "days": int(job.get("days", 365))
+        })
+
+    return jobs
+
+
+def job_window(job):
+    """(start_date, end_date) of a job's sync window, ending today"""
+    today = datetime.now()
+    return (today - timedelta(days=job["days"])).strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")
+
+
+def sync_job(job, csv_path):
+    """
+    Replace a job's date window in its Dataverse table with the CSV contents
+
+    Uses delete-then-upload or per-partition replace depending on SYNC_MODE
+
+    Args:
+        job: Job dict from load_jobs()
+        csv_path: Path to the downloaded report for this job
+
+    Raises:
+        RuntimeError: If any batch failed or verification still finds differences
+    """
+    logger = get_logger()
+
+    start_date, end_date = job_window(job)
+
+    logger.info(f"[{job['name']}] Syncing {csv_path} -> {job['table_name']} ({start_date} to {end_date})")
+
+    if ARCHIVE_ENABLED:
+        from report_archive import archive_report
+
+        archive_report(csv_path)
+
+    # One token per job, shared by its delete and upload steps
+    token = get_dataverse_token()
+
+    if SYNC_MODE == "replace":
+        if not replace_records_in_date_range(csv_path, start_date, end_date,
+                                             table_name=job["table_name"],
+                                             table_prefix=job["table_prefix"],
+                                             token=token):
+            raise RuntimeError("one or more partitions could not be replaced")
+    else:
+        # Never upload over rows that could not be deleted
+        if not delete_records_in_date_range(start_date, end_date,
+                                            table_name=job["table_name"],
+                                            table_prefix=job["table_prefix"],
+                                            token=token):
+            raise RuntimeError("one or more delete batches failed")
+        if not upload_to_dataverse(csv_path, start_date=start_date, end_date=end_date,
+                                   table_name=job["table_name"],
+                                   table_prefix=job["table_prefix"],
+                                   token=token):
+            raise RuntimeError("one or more upload batches failed or rows were skipped")
+
+    if VERIFY_AFTER_SYNC:
+        from reconcile import verify_sync
+
+        remaining = verify_sync(csv_path, start_date, end_date,
+                                table_name=job["table_name"],
+                                table_prefix=job["table_prefix"],
+                                token=token)
+        if remaining:
+            raise RuntimeError(f"partitions still differ after re-sync: {', '.join(remaining)}")
+
+    logger.info(f"[{job['name']}] Sync complete")
+
+
+def run_jobs(jobs, force_download=False):
+    """
+    Run all jobs, overlapping the next download with previous uploads
+
+    Args:
+        jobs: List of job dicts from load_jobs()
+        force_download: Download every report again even if today's file exists
+
+    Returns:
+        List of names of jobs that failed
+    """
+    logger = get_logger()
+    logger.info(f"=== Running {len(jobs)} sync jobs (max {SYNC_MAX_WORKERS} concurrent) ===")
+
+    failed = []
+    download_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="download")
+    sync_pool = ThreadPoolExecutor(max_workers=SYNC_MAX_WORKERS, thread_name_prefix="sync")
+
+    try:
+        # Queue every download up front; the single download worker works
+        # through them while finished reports are handed to the sync pool
+        downloads = []
+        for job in jobs:
+            start_date, end_date = job_window(job)
+            downloads.append((job, download_pool.submit(download_report, job["report_id"], force=force_download,
+                                                        start_date=start_date, end_date=end_date)))
+
+        syncs = []
+        for job, future in downloads:
+            try:
+                csv_path = future.result()
+            except Exception as e:
+                logger.error(f"[{job['name']}] Download failed: {str(e)}")
+                failed.append(job["name"])
+                continue
+
+            syncs.append((job, sync_pool.submit(sync_job, job, csv_path)))
+
+        for job, future in syncs:
+            try:
+                future.result()
+            except Exception as e:
+                logger.error(f"[{job['name']}] Sync failed: {str(e)}", exc_info=True)
+                failed.append(job["name"])
+    finally:
+        download_pool.shutdown(wait=True)
+        sync_pool.shutdown(wait=True)
+
+    if ARCHIVE_ENABLED:
+        from report_archive import apply_retention
+
+        apply_retention()
+
+    logger.info(f"=== {len(jobs) - len(failed)}/{len(jobs)} jobs completed ===")
+    if failed:
+        logger.error(f"Failed jobs: {', '.join(failed)}")
+
+    return failed
+
+
+def main():
+    """Run every job in the jobs file"""
+    logger = setup_logger()
+
+    jobs_file = Path(sys.argv[1]) if len(sys.argv) > 1 else SYNC_JOBS_FILE
+
+    if not (DATAVERSE_USERNAME and DATAVERSE_PASSWORD):
+        logger.warning("Skipping sync - Dataverse credentials not configured")
+        logger.warning("Please set DATAVERSE_USERNAME and DATAVERSE_PASSWORD in .env file")
+        return
+
+    jobs = load_jobs(jobs_file)
+    if not jobs:
+        logger.warning(f"No jobs defined in {jobs_file}")
+        return
+
+    failed = run_jobs(jobs)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Built-in profiling for sync runs (--profile)
+
+Each phase of a run (download, archive, sync, rollups) is profiled on its
+own with three tools:
+    cProfile     exact call counts and times of the main thread -> <phase>.prof
+    sampler      wall-clock stacks of every thread (workers, asyncio, waits
+                 on the network) every PROFILE_SAMPLE_INTERVAL_MS -> <phase>.folded
+    tracemalloc  allocations made during the phase, by source line
+
+Output goes to PROJECT_DIR/logs/profile_<command>_<timestamp>/ next to the run log:
+    <phase>.prof     open with snakeviz, gprof2dot or python -m pstats
+    <phase>.folded   collapsed stacks for flamegraph.pl or speedscope.app
+    summary.txt      top PROFILE_TOP_N functions and allocations per phase
+
+Profiling is off unless start_profiling() is called, and profile_phase()
+is then a no-op, so the phases can stay marked in the normal code path.
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from config import PROJECT_DIR, PROFILE_TOP_N, PROFILE_SAMPLE_INTERVAL_MS
+import logger as logger_module
+from logger import get_logger
+
+
+_session = None
+
+
+class StackSampler:
+    """Background thread that counts the call stacks of every other thread"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.counts = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self):
+        # Skip ourselves and the log writer thread, which is idle nearly always
+        ignored = {threading.get_ident()}
+        listener_thread = getattr(logger_module._listener, "_thread", None)
+        if listener_thread is not None:
+            ignored.add(listener_thread.ident)
+
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id in ignored:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                filename = code.co_filename
+                module = filename if filename.startswith("<") else os.path.splitext(os.path.basename(filename))[0]
+                stack.append(f"{module}.{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+
+            stack.append(names.get(thread_id, str(thread_id)))
+            # Folded format: root first, frames separated by ';'
+            self.counts[";".join(reversed(stack))] += 1
+
+        self.samples += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write_folded(self, path):
+        """Write collapsed stacks ('frame;frame;frame count' per line)"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ProfileSession:
+    """Output directory and per-phase results of one profiled run"""
+
+    def __init__(self, output_dir, top_n, sample_interval):
+        self.output_dir = output_dir
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.summaries = []
+        self.active_phase = None
+        self.started_tracemalloc = False
+
+
+def start_profiling(label="sync"):
+    """
+    Turn on profiling for the phases that follow
+
+    Args:
+        label: Name used in the output directory (profile_<label>_<timestamp>)
+
+    Returns:
+        Path to the output directory
+    """
+    global _session
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    output_dir = PROJECT_DIR / "logs" / f"profile_{label}_{timestamp}"
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    _session = ProfileSession(output_dir, PROFILE_TOP_N, PROFILE_SAMPLE_INTERVAL_MS / 1000)
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _session.started_tracemalloc = True
+
+    get_logger().info(f"Profiling enabled, writing results to {output_dir}")
+    return output_dir
+
+
+def stop_profiling():
+    """Write summary.txt and turn profiling off"""
+    global _session
+
+    if _session is None:
+        return None
+
+    session, _session = _session, None
+    summary_path = session.output_dir / "summary.txt"
+    with open(summary_path, 'w', encoding='utf-8') as f:
+        f.write("\n\n".join(session.summaries) + "\n")
+
+    if session.started_tracemalloc:
+        tracemalloc.stop()
+
+    get_logger().info(f"Profile summary written to {summary_path}")
+    return summary_path
+
+
+def _phase_summary(name, elapsed, profiler, sampler, start_snapshot, end_snapshot, peak, top_n):
+    """Text block with the hotspots and allocations of one phase"""
+    out = io.StringIO()
+    out.write(f"=== Phase: {name} ({elapsed:.2f}s wall, {sampler.samples} stack samples, "
+              f"peak traced memory {peak / 1e6:.1f} MB) ===\n\n")
+
+    out.write(f"Top {top_n} functions by cumulative time (main thread):\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(top_n)
+
+    out.write(f"Top {top_n} functions by own time (main thread):\n")
+    pstats.Stats(profiler, stream=out).sort_stats("tottime").print_stats(top_n)
+
+    # Leaf frame of each sampled stack = where the thread actually was
+    leaves = Counter()
+    for stack, count in sampler.counts.items():
+        leaves[stack.rsplit(";", 1)[-1]] += count
+    total = sum(leaves.values()) or 1
+    out.write(f"Top {top_n} sampled frames (all threads, wall clock incl. waiting):\n")
+    for frame, count in leaves.most_common(top_n):
+        out.write(f"  {count * 100 / total:5.1f}%  {frame}\n")
+
+    out.write(f"\nTop {top_n} allocations made during the phase (by line):\n")
+    for stat in end_snapshot.compare_to(start_snapshot, "lineno")[:top_n]:
+        out.write(f"  {stat}\n")
+
+    return out.getvalue()
+
+
+@contextmanager
+def profile_phase(name):
+    """
+    Profile the enclosed block as one phase (no-op unless profiling is on)
+
+    Phases do not nest; an inner phase is folded into the outer one.
+    """
+    session = _session
+    if session is None or session.active_phase is not None:
+        yield
+        return
+
+    logger = get_logger()
+    session.active_phase = name
+
+    if hasattr(tracemalloc, "reset_peak"):
+        tracemalloc.reset_peak()
+    start_snapshot = tracemalloc.take_snapshot()
+    sampler = StackSampler(session.sample_interval)
+    profiler = cProfile.Profile()
+
+    started = time.perf_counter()
+    sampler.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        sampler.stop()
+        elapsed = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        end_snapshot = tracemalloc.take_snapshot()
+        session.active_phase = None
+
+        profiler.dump_stats(str(session.output_dir / f"{name}.prof"))
+        sampler.write_folded(session.output_dir / f"{name}.folded")
+        session.summaries.append(_phase_summary(name, elapsed, profiler, sampler,
+                                                start_snapshot, end_snapshot, peak, session.top_n))
+
+        logger.info(f"Profiled phase '{name}': {elapsed:.2f}s, peak traced memory {peak / 1e6:.1f} MB")
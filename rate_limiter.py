@@ -0,0 +1,216 @@
+"""
+Client-side rate limit for Dataverse requests, shared across processes
+
+Dataverse throttles each user to 6000 requests per 5 minutes and answers
+with 429 and a Retry-After of up to several minutes once the limit is hit.
+Every Dataverse request (uploads, deletes, queries, metadata, aggregates,
+async client) first takes a token from a bucket that refills at
+DATAVERSE_RATE_LIMIT_PER_MINUTE and holds at most DATAVERSE_RATE_LIMIT_BURST
+tokens. The bucket lives in a SQLite file (RATE_LIMIT_DB_FILE), so main.py,
+the daemon, shard workers and ad-hoc scripts running at the same time share
+one budget per DATAVERSE_USERNAME instead of throttling each other.
+
+A 429 response empties the bucket until its Retry-After has passed, which
+pauses every process using the same account. send_throttled() and
+send_throttled_async() then resend the throttled request once the pause is
+over, at most THROTTLE_RETRIES times.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+from config import (
+    DATAVERSE_USERNAME,
+    DATAVERSE_RATE_LIMIT_PER_MINUTE,
+    DATAVERSE_RATE_LIMIT_BURST,
+    RATE_LIMIT_DB_FILE
+)
+from logger import get_logger, SAMPLED
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS buckets (
+    name    TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+)
+"""
+
+# Waits shorter than this are not logged
+LOG_WAIT_SECONDS = 1.0
+
+# Resends of a request Dataverse keeps answering with 429
+THROTTLE_RETRIES = 3
+
+_local = threading.local()
+
+
+def _connection():
+    """Per-thread connection to the bucket database (autocommit, for BEGIN IMMEDIATE)"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(str(RATE_LIMIT_DB_FILE), timeout=30, isolation_level=None)
+        conn.execute(SCHEMA)
+        _local.conn = conn
+    return conn
+
+
+def _bucket_name():
+    """Limits are per Dataverse user, so the bucket is too"""
+    return f"dataverse:{DATAVERSE_USERNAME}"
+
+
+def _take(cost):
+    """
+    Take tokens if the bucket has them
+
+    Returns:
+        0 if the tokens were taken, else seconds to wait before trying again
+    """
+    rate = DATAVERSE_RATE_LIMIT_PER_MINUTE / 60
+    conn = _connection()
+    name = _bucket_name()
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        now = time.time()
+        row = conn.execute("SELECT tokens, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            tokens, updated = float(DATAVERSE_RATE_LIMIT_BURST), now
+        else:
+            tokens, updated = row
+
+        if now < updated:
+            # Paused after a 429
+            conn.execute("COMMIT")
+            return updated - now
+
+        tokens = min(DATAVERSE_RATE_LIMIT_BURST, tokens + (now - updated) * rate)
+        if tokens >= cost:
+            tokens -= cost
+            wait = 0.0
+        else:
+            wait = (cost - tokens) / rate
+
+        conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                     (name, tokens, now))
+        conn.execute("COMMIT")
+        return wait
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def acquire(cost=1):
+    """Block until `cost` requests may be sent (no-op if the limit is off)"""
+    if DATAVERSE_RATE_LIMIT_PER_MINUTE <= 0:
+        return
+
+    waited = 0.0
+    while True:
+        wait = _take(cost)
+        if not wait:
+            break
+        time.sleep(wait)
+        waited += wait
+
+    if waited >= LOG_WAIT_SECONDS:
+        get_logger().info("  Rate limit: waited %.1fs for a request slot", waited, extra=SAMPLED)
+
+
+async def acquire_async(cost=1):
+    """acquire() for the asyncio client; waits without blocking the event loop"""
+    if DATAVERSE_RATE_LIMIT_PER_MINUTE <= 0:
+        return
+
+    loop = asyncio.get_running_loop()
+    waited = 0.0
+    while True:
+        # _take() can block on the SQLite lock for up to its 30s timeout
+        wait = await loop.run_in_executor(None, _take, cost)
+        if not wait:
+            break
+        await asyncio.sleep(wait)
+        waited += wait
+
+    if waited >= LOG_WAIT_SECONDS:
+        get_logger().info("  Rate limit: waited %.1fs for a request slot", waited, extra=SAMPLED)
+
+
+def pause(seconds):
+    """Hold every process's requests for `seconds` (after a 429)"""
+    conn = _connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, 0, ?)",
+                     (_bucket_name(), time.time() + seconds))
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def check_throttled(response):
+    """
+    Pause the shared bucket if Dataverse throttled a request
+
+    Args:
+        response: requests or httpx response
+
+    Returns:
+        True if the response was a 429
+    """
+    if response.status_code != 429:
+        return False
+
+    retry_after = _retry_after(response)
+    get_logger().warning(f"Dataverse throttled a request (429); pausing all requests for {retry_after:.0f}s")
+    if DATAVERSE_RATE_LIMIT_PER_MINUTE > 0:
+        pause(retry_after)
+    return True
+
+
+def _retry_after(response):
+    """Seconds from a 429's Retry-After header (60 if missing or not a number)"""
+    try:
+        return float(response.headers.get("Retry-After", "60"))
+    except ValueError:
+        return 60.0
+
+
+def send_throttled(send):
+    """
+    Send a request, resending it after the pause if Dataverse throttles it
+
+    Args:
+        send: Callable that sends the request and returns the response
+            (a streamed response that gets resent is closed first)
+
+    Returns:
+        The first response that is not a 429, or the last 429 once
+        THROTTLE_RETRIES resends have been used up
+    """
+    for attempt in range(THROTTLE_RETRIES + 1):
+        acquire()
+        response = send()
+        if not check_throttled(response) or attempt == THROTTLE_RETRIES:
+            return response
+        response.close()
+        if DATAVERSE_RATE_LIMIT_PER_MINUTE <= 0:
+            # No shared bucket to hold the next acquire(), so wait here
+            time.sleep(_retry_after(response))
+        get_logger().info("  Resending throttled request (retry %d/%d)", attempt + 1, THROTTLE_RETRIES)
+
+
+async def send_throttled_async(send):
+    """send_throttled() for the asyncio client; `send` returns an awaitable"""
+    for attempt in range(THROTTLE_RETRIES + 1):
+        await acquire_async()
+        response = await send()
+        if not check_throttled(response) or attempt == THROTTLE_RETRIES:
+            return response
+        await response.aclose()
+        if DATAVERSE_RATE_LIMIT_PER_MINUTE <= 0:
+            await asyncio.sleep(_retry_after(response))
+        get_logger().info("  Resending throttled request (retry %d/%d)", attempt + 1, THROTTLE_RETRIES)
@@ -0,0 +1,205 @@
+"""
+Post-sync verification of Dataverse against the report
+
+Row counts and sums of hours and bill amounts are computed per partition
+(VERIFY_PARTITION: day, week or month) from the report and fetched from
+Dataverse with $apply aggregates, so no rows are downloaded. Partitions
+whose totals differ are re-synced with replace_records_in_date_range() and
+checked once more.
+"""
+
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from dataverse_client import (
+    get_dataverse_token,
+    load_records,
+    parse_date,
+    partition_key,
+    replace_records_in_date_range
+)
+from dataverse_metadata import get_entity_metadata, validate_records
+from dataverse_planning import aggregate_date_range
+from config import (
+    TABLE_NAME,
+    TABLE_PREFIX,
+    VALIDATE_RECORDS,
+    VERIFY_PARTITION,
+    VERIFY_RESYNC
+)
+from logger import get_logger
+
+
+# CSV columns whose sums are compared
+VERIFY_MEASURES = ["Hours", "BillAmountBC", "BillableAmountBC", "BillAmountLC", "BillableAmountLC"]
+
+# Largest difference in a sum that still counts as equal (amounts have 2 decimals)
+SUM_TOLERANCE = 0.01
+
+
+def _empty_totals(measure_fields):
+    return dict.fromkeys(["row_count"] + measure_fields, 0)
+
+
+def local_totals(csv_file_path, start_date, end_date, partition, table_name, table_prefix, token):
+    """
+    Totals per partition of the rows the sync uploads (after dedup and validation)
+
+    Returns:
+        OrderedDict of {partition_start: {"row_count": n, field: total, ...}}
+    """
+    date_field_name = f"{table_prefix}_date"
+    measure_fields = [f"{table_prefix}_{name.lower()}" for name in VERIFY_MEASURES]
+
+    records = load_records(csv_file_path, start_date, end_date, table_prefix)
+    if VALIDATE_RECORDS:
+        records = validate_records(records, get_entity_metadata(token, table_name))
+
+    totals = {}
+    for record in records:
+        day = parse_date(record[date_field_name])
+        if day is None:
+            continue
+        key = partition_key(day, partition)
+        partition_totals = totals.setdefault(key, _empty_totals(measure_fields))
+        partition_totals["row_count"] += 1
+        for field in measure_fields:
+            partition_totals[field] += record[field] or 0
+
+    return OrderedDict(sorted(totals.items()))
+
+
+def remote_totals(start_date, end_date, partition, table_name, table_prefix, token):
+    """
+    Totals per partition in Dataverse, from per-day $apply aggregates
+
+    Returns:
+        OrderedDict of {partition_start: {"row_count": n, field: total, ...}}
+    """
+    date_field_name = f"{table_prefix}_date"
+    measure_fields = [f"{table_prefix}_{name.lower()}" for name in VERIFY_MEASURES]
+
+    days = aggregate_date_range(token, start_date, end_date, measure_fields, date_field_name, table_name)
+
+    totals = {}
+    for day, day_totals in days.items():
+        if day == "(no date)":
+            continue
+        key = partition_key(day, partition)
+        partition_totals = totals.setdefault(key, _empty_totals(measure_fields))
+        for field, value in day_totals.items():
+            partition_totals[field] += value
+
+    return OrderedDict(sorted(totals.items()))
+
+
+def compare_totals(local, remote):
+    """
+    Partitions whose row count or any sum differs
+
+    Returns:
+        OrderedDict of {partition_start: list of "field: local != remote" strings}
+    """
+    differences = OrderedDict()
+    for key in sorted(set(local) | set(remote)):
+        local_partition = local.get(key, {})
+        remote_partition = remote.get(key, {})
+
+        mismatches = []
+        for field in local_partition.keys() | remote_partition.keys():
+            local_value = local_partition.get(field, 0)
+            remote_value = remote_partition.get(field, 0)
+            if field == "row_count":
+                equal = local_value == remote_value
+            else:
+                equal = abs(local_value - remote_value) <= SUM_TOLERANCE
+            if not equal:
+                mismatches.append(f"{field}: {round(local_value, 2)} != {round(remote_value, 2)}")
+
+        if mismatches:
+            differences[key] = sorted(mismatches)
+
+    return differences
+
+
+def partition_range(key, partition, start_date, end_date):
+    """Date range of a partition, clipped to the sync window"""
+    first = datetime.strptime(key, "%Y-%m-%d")
+    if partition == "day":
+        last = first
+    elif partition == "week":
+        last = first + timedelta(days=6)
+    else:
+        last = (first.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+    return max(key, start_date), min(last.strftime("%Y-%m-%d"), end_date)
+
+
+def verify_sync(csv_file_path, start_date, end_date, partition=None, resync=None,
+                table_name=None, table_prefix=None, token=None):
+    """
+    Compare Dataverse with the report and re-sync the partitions that differ
+
+    Args:
+        csv_file_path: Path to the report that was synced
+        start_date: Start date in format 'YYYY-MM-DD'
+        end_date: End date in format 'YYYY-MM-DD'
+        partition: 'day', 'week' or 'month' (default: VERIFY_PARTITION from config)
+        resync: Replace differing partitions (default: VERIFY_RESYNC from config)
+        table_name: Target table (default: TABLE_NAME from config)
+        table_prefix: Column prefix (default: TABLE_PREFIX from config)
+        token: Optional access token to reuse instead of authenticating
+
+    Returns:
+        List of partitions that still differ
+    """
+    logger = get_logger()
+
+    if partition is None:
+        partition = VERIFY_PARTITION
+    if resync is None:
+        resync = VERIFY_RESYNC
+    if table_name is None:
+        table_name = TABLE_NAME
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
+
+    logger.info(f"=== Verifying '{table_name}' against the report ({start_date} to {end_date}, per {partition}) ===")
+
+    if token is None:
+        logger.info("Authenticating to Dataverse...")
+        token = get_dataverse_token()
+
+    local = local_totals(csv_file_path, start_date, end_date, partition, table_name, table_prefix, token)
+    differences = compare_totals(local, remote_totals(start_date, end_date, partition,
+                                                      table_name, table_prefix, token))
+
+    if not differences:
+        logger.info(f"✓ All {len(local)} partitions match")
+        return []
+
+    for key, mismatches in differences.items():
+        logger.warning(f"  Partition {key} differs: {'; '.join(mismatches)}")
+    logger.warning(f"{len(differences)} of {len(set(local) | set(differences))} partitions differ")
+
+    if not resync:
+        return list(differences)
+
+    for key in differences:
+        first, last = partition_range(key, partition, start_date, end_date)
+        logger.info(f"Re-syncing partition {key} ({first} to {last})...")
+        replace_records_in_date_range(csv_file_path, first, last, partition=partition,
+                                      table_name=table_name, table_prefix=table_prefix, token=token)
+
+    # Check the repaired partitions once more
+    remaining = []
+    for key in differences:
+        first, last = partition_range(key, partition, start_date, end_date)
+        remote = remote_totals(first, last, partition, table_name, table_prefix, token)
+        if compare_totals({key: local[key]} if key in local else {}, remote):
+            remaining.append(key)
+
+    if remaining:
+        logger.error(f"Partitions still differ after re-sync: {', '.join(remaining)}")
+    else:
+        logger.info(f"✓ Re-synced {len(differences)} partitions; all match now")
+    return remaining
@@ -0,0 +1,245 @@
+"""
+Columnar archive of downloaded Unanet reports
+
+Each downloaded CSV is converted once into compressed Parquet, partitioned by
+the month of the row's Date column:
+
+    archive/<report>/snapshot=YYYY-MM-DD/month=YYYY-MM/part-0.parquet
+
+Readers only open the month partitions that overlap the requested date range
+and only the columns they need, memory-mapped. Old snapshots are removed
+after ARCHIVE_RETENTION_DAYS, and raw CSVs from previous days are deleted
+once they are archived.
+"""
+
+import csv
+import re
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+from config import (
+    ARCHIVE_DIR,
+    ARCHIVE_RETENTION_DAYS,
+    ARCHIVE_COMPRESSION,
+    DOWNLOAD_DIR,
+    TABLE_PREFIX
+)
+from logger import get_logger
+
+
+# Same formats as dataverse_client.parse_date
+DATE_FORMATS = ["%m/%d/%Y", "%Y-%m-%d", "%m-%d-%Y", "%Y/%m/%d"]
+
+# Parsed Date column added to every archived row
+DATE_COLUMN = "_date"
+
+_SNAPSHOT_NAME = re.compile(r"^(?P<report>.+)_(?P<date>\d{4}-\d{2}-\d{2})$")
+
+
+def _split_report_name(csv_path):
+    """Split 'unanet_report_R_104_2025-10-24.csv' into ('unanet_report_R_104', '2025-10-24')"""
+    match = _SNAPSHOT_NAME.match(Path(csv_path).stem)
+    if not match:
+        raise ValueError(f"Report file name has no date suffix: {csv_path}")
+    return match.group("report"), match.group("date")
+
+
+def snapshot_dir(csv_path):
+    """Archive directory for a downloaded report file"""
+    report, snapshot = _split_report_name(csv_path)
+    return ARCHIVE_DIR / report / f"snapshot={snapshot}"
+
+
+def _snapshot_current(csv_path, target):
+    """True if the snapshot exists and is not older than the CSV it was made from"""
+    if not target.exists():
+        return False
+    csv_file = Path(csv_path)
+    # A report downloaded again the same day (e.g. DAEMON_REFRESH_REPORT) replaces the snapshot
+    return not csv_file.exists() or csv_file.stat().st_mtime <= target.stat().st_mtime
+
+
+def is_archived(csv_path):
+    """
+    True if the report file has already been converted (and not downloaded again since)
+
+    Files without a snapshot date in their name (custom exports) are never archived.
+    """
+    if not _SNAPSHOT_NAME.match(Path(csv_path).stem):
+        return False
+    return _snapshot_current(csv_path, snapshot_dir(csv_path))
+
+
+def parse_dates(values):
+    """Vectorized parse_date(): string array -> date32 array (null if unparseable)"""
+    values = pc.utf8_trim_whitespace(values)
+    parsed = [pc.strptime(values, format=fmt, unit="s", error_is_null=True) for fmt in DATE_FORMATS]
+    return pc.coalesce(*parsed).cast(pa.date32())
+
+
+def archive_report(csv_path):
+    """
+    Convert a downloaded CSV into a month-partitioned Parquet snapshot
+
+    Args:
+        csv_path: Path to a downloaded report (unanet_report_..._YYYY-MM-DD.csv)
+
+    Returns:
+        Path to the snapshot directory
+    """
+    logger = get_logger()
+
+    target = snapshot_dir(csv_path)
+    if _snapshot_current(csv_path, target):
+        logger.info(f"Report already archived: {target}")
+        return target
+
+    # Read every column as text so the archive is a lossless copy of the CSV
+    with open(csv_path, 'r', encoding='utf-8-sig', newline='') as f:
+        column_names = next(csv.reader(f))
+
+    table = pacsv.read_csv(
+        csv_path,
+        convert_options=pacsv.ConvertOptions(
+            column_types={name: pa.string() for name in column_names},
+            strings_can_be_null=False
+        )
+    )
+
+    dates = parse_dates(table.column("Date"))
+    table = table.append_column(DATE_COLUMN, dates)
+    table = table.append_column("month", pc.fill_null(pc.strftime(dates, format="%Y-%m"), "unknown"))
+
+    # Write to a temp directory first so a crash never leaves a partial snapshot
+    staging = target.with_name(target.name + ".tmp")
+    if staging.exists():
+        shutil.rmtree(staging)
+
+    pads.write_dataset(
+        table,
+        staging,
+        format="parquet",
+        partitioning=pads.partitioning(pa.schema([("month", pa.string())]), flavor="hive"),
+        file_options=pads.ParquetFileFormat().make_write_options(compression=ARCHIVE_COMPRESSION),
+        basename_template="part-{i}.parquet"
+    )
+    if target.exists():
+        # Today's report was downloaded again; swap the outdated snapshot out
+        outdated = target.with_name(target.name + ".old")
+        if outdated.exists():
+            shutil.rmtree(outdated)
+        target.rename(outdated)
+        staging.rename(target)
+        shutil.rmtree(outdated)
+        logger.info(f"Replaced outdated snapshot {target}")
+    else:
+        staging.rename(target)
+
+    logger.info(f"Archived {table.num_rows} rows to {target}")
+    return target
+
+
+def apply_retention(report=None, today=None):
+    """
+    Remove snapshots older than ARCHIVE_RETENTION_DAYS and raw CSVs that are
+    already archived (today's CSV is kept as the download cache)
+
+    Args:
+        report: Report name prefix (default: every report in the archive)
+        today: Override for the current date (YYYY-MM-DD)
+    """
+    logger = get_logger()
+
+    if today is None:
+        today = datetime.now().strftime("%Y-%m-%d")
+    cutoff = (datetime.strptime(today, "%Y-%m-%d") - timedelta(days=ARCHIVE_RETENTION_DAYS)).strftime("%Y-%m-%d")
+
+    report_dirs = [ARCHIVE_DIR / report] if report else [p for p in ARCHIVE_DIR.glob("*") if p.is_dir()]
+    for report_dir in report_dirs:
+        for snapshot in report_dir.glob("snapshot=*"):
+            if snapshot.name.split("=", 1)[1] < cutoff:
+                shutil.rmtree(snapshot)
+                logger.info(f"Removed expired archive snapshot: {snapshot}")
+
+    for csv_path in DOWNLOAD_DIR.glob("unanet_report_*.csv"):
+        try:
+            _, snapshot = _split_report_name(csv_path)
+        except ValueError:
+            continue
+        if snapshot < today and is_archived(csv_path):
+            csv_path.unlink()
+            logger.info(f"Removed archived CSV: {csv_path}")
+
+
+def _month_partitions(root, start_date, end_date):
+    """Month partition directories under a snapshot that overlap the date range"""
+    start_month = start_date[:7] if start_date else "0000-00"
+    end_month = end_date[:7] if end_date else "9999-99"
+
+    partitions = []
+    for month_dir in sorted(root.glob("month=*")):
+        month = month_dir.name.split("=", 1)[1]
+        if month == "unknown" or start_month <= month <= end_month:
+            partitions.append(month_dir)
+    return partitions
+
+
+def read_archive(csv_path, start_date=None, end_date=None, columns=None):
+    """
+    Read archived rows for a report snapshot
+
+    Args:
+        csv_path: The downloaded report file the snapshot was made from
+        start_date: Optional inclusive start date (YYYY-MM-DD)
+        end_date: Optional inclusive end date (YYYY-MM-DD)
+        columns: Optional list of CSV columns to read (default: all)
+
+    Returns:
+        pyarrow.Table with the requested columns plus the parsed date column
+    """
+    root = snapshot_dir(csv_path)
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + [DATE_COLUMN]))
+
+    tables = []
+    for month_dir in _month_partitions(root, start_date, end_date):
+        for part in sorted(month_dir.glob("*.parquet")):
+            tables.append(pq.read_table(part, columns=read_columns, memory_map=True))
+
+    if not tables:
+        return pa.table({DATE_COLUMN: pa.array([], pa.date32())})
+
+    table = pa.concat_tables(tables)
+
+    if start_date or end_date:
+        mask = pc.is_valid(table.column(DATE_COLUMN))
+        if start_date:
+            start = pa.scalar(datetime.strptime(start_date, "%Y-%m-%d").date(), pa.date32())
+            mask = pc.and_(mask, pc.greater_equal(table.column(DATE_COLUMN), start))
+        if end_date:
+            end = pa.scalar(datetime.strptime(end_date, "%Y-%m-%d").date(), pa.date32())
+            mask = pc.and_(mask, pc.less_equal(table.column(DATE_COLUMN), end))
+        table = table.filter(mask)
+
+    return table
+
+
+def read_archive_records(csv_path, start_date=None, end_date=None, table_prefix=None):
+    """Read archived rows in a date range as Dataverse records"""
+    from dataverse_client import CSV_COLUMNS, DataverseRecord
+
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
+
+    table = read_archive(csv_path, start_date, end_date)
+    if table.num_rows == 0:
+        return []
+
+    # Convert column by column instead of materialising one dict per row
+    columns = [table.column(name).to_pylist() if name in table.column_names else [None] * table.num_rows
+               for name in CSV_COLUMNS]
+    return [DataverseRecord.from_csv_values(values, table_prefix) for values in zip(*columns)]
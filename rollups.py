@@ -0,0 +1,245 @@
+"""
+Pre-aggregated rollups for reporting consumers
+
+Groups the mapped report rows by project, person and month (configurable)
+and sums hours and bill amounts with vectorized group-by, then syncs the
+result incrementally to a summary table (ROLLUP_TABLE_NAME): only new,
+changed and vanished groups are written.
+
+Summary table columns, all prefixed with ROLLUP_TABLE_PREFIX:
+    one text column per ROLLUP_GROUP_BY field (e.g. cr834_projectcode, cr834_person)
+    cr834_month      text, YYYY-MM
+    cr834_rowcount   whole number
+    cr834_hours, cr834_billamountbc, cr834_billableamountbc,
+    cr834_billamountlc, cr834_billableamountlc   decimal
+"""
+
+import pyarrow as pa
+import pyarrow.compute as pc
+from dataverse_client import (
+    get_dataverse_token,
+    get_session,
+    load_records,
+    build_batch_body,
+    post_batch,
+    batch_succeeded
+)
+from dataverse_metadata import get_primary_key_field
+from report_archive import parse_dates
+from config import (
+    DATAVERSE_URL,
+    TABLE_PREFIX,
+    BATCH_SIZE,
+    ROLLUP_TABLE_NAME,
+    ROLLUP_TABLE_PREFIX,
+    ROLLUP_GROUP_BY
+)
+from logger import get_logger
+from rate_limiter import send_throttled
+
+
+# CSV columns summed per group
+ROLLUP_MEASURES = ["Hours", "BillAmountBC", "BillableAmountBC", "BillAmountLC", "BillableAmountLC"]
+
+
+def _rollup_field(name):
+    """Summary table column for a CSV column or rollup field"""
+    return f"{ROLLUP_TABLE_PREFIX}_{name.lower()}"
+
+
+def compute_rollups(records, table_prefix=None):
+    """
+    Aggregate mapped records by ROLLUP_GROUP_BY and month
+
+    Args:
+        records: Records from load_records() / read_csv_records()
+        table_prefix: Column prefix of the records (default: TABLE_PREFIX)
+
+    Returns:
+        List of summary rows keyed by the summary table's column names
+    """
+    if table_prefix is None:
+        table_prefix = TABLE_PREFIX
+
+    if not records:
+        return []
+
+    group_fields = [f"{table_prefix}_{name.lower()}" for name in ROLLUP_GROUP_BY]
+    measure_fields = [f"{table_prefix}_{name.lower()}" for name in ROLLUP_MEASURES]
+
+    # Build typed columns once; everything after this is vectorized
+    columns = {field: pa.array([record.get(field) for record in records], pa.string())
+               for field in group_fields}
+    for field in measure_fields:
+        columns[field] = pa.array([record.get(field) for record in records], pa.float64())
+    dates = pa.array([record.get(f"{table_prefix}_date") for record in records], pa.string())
+    columns["month"] = pc.strftime(parse_dates(dates), format="%Y-%m")
+
+    table = pa.table(columns)
+    table = table.filter(pc.is_valid(table.column("month")))
+
+    grouped = table.group_by(group_fields + ["month"]).aggregate(
+        [(field, "sum") for field in measure_fields] + [([], "count_all")]
+    )
+
+    rollups = []
+    for row in grouped.to_pylist():
+        rollup = {_rollup_field(name): row[field] for name, field in zip(ROLLUP_GROUP_BY, group_fields)}
+        rollup[_rollup_field("month")] = row["month"]
+        rollup[_rollup_field("rowcount")] = row["count_all"]
+        for name, field in zip(ROLLUP_MEASURES, measure_fields):
+            total = row[f"{field}_sum"]
+            rollup[_rollup_field(name)] = round(total, 2) if total is not None else 0.0
+        rollups.append(rollup)
+
+    return rollups
+
+
+def _group_key(row):
+    """Identity of a summary row: its group-by values and month"""
+    return tuple(row.get(_rollup_field(name)) for name in ROLLUP_GROUP_BY + ["month"])
+
+
+def _values_differ(new_row, existing_row):
+    """True if any measure or row count changed (amounts compared at 2 decimals)"""
+    for field, value in new_row.items():
+        current = existing_row.get(field)
+        if isinstance(value, float):
+            if current is None or round(float(current), 2) != round(value, 2):
+                return True
+        elif value != current:
+            return True
+    return False
+
+
+def _fetch_existing_rollups(token, primary_key_field, first_month, last_month):
+    """Fetch summary rows for a month range, keyed by _group_key()"""
+    logger = get_logger()
+
+    headers = {
+        "Authorization": f"Bearer {token}",
+        "OData-MaxVersion": "4.0",
+        "OData-Version": "4.0",
+        "Accept": "application/json"
+    }
+
+    month_field = _rollup_field("month")
+    select = ",".join([primary_key_field, month_field, _rollup_field("rowcount")]
+                      + [_rollup_field(name) for name in ROLLUP_GROUP_BY + ROLLUP_MEASURES])
+    url = (f"{DATAVERSE_URL}/api/data/v9.2/{ROLLUP_TABLE_NAME}"
+           f"?$filter={month_field} ge '{first_month}' and {month_field} le '{last_month}'&$select={select}")
+
+    existing = {}
+    while url:
+        response = send_throttled(lambda: get_session().get(url, headers=headers))
+        if response.status_code != 200:
+            raise RuntimeError(f"Error fetching rollups: {response.status_code} - {response.text[:500]}")
+
+        data = response.json()
+        for row in data.get('value', []):
+            existing[_group_key(row)] = row
+        url = data.get('@odata.nextLink', None)
+
+    logger.info(f"Found {len(existing)} existing rollup rows for {first_month} to {last_month}")
+    return existing
+
+
+def _covered_months(start_date, end_date):
+    """
+    Months whose rows the range fully contains
+
+    A month cut off by start_date (not on the 1st) is left out; so is one
+    cut off by end_date, unless end_date is today or later (the month so far
+    is complete).
+
+    Returns:
+        Tuple of (first day, last day) in YYYY-MM-DD, or None if no month is covered
+    """
+    from datetime import datetime, timedelta
+
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+
+    if start.day != 1:
+        start = (start.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+    month_end = (end.replace(day=1) + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    if end < month_end and end.date() < datetime.now().date():
+        end = end.replace(day=1) - timedelta(days=1)
+
+    if start > end:
+        return None
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def sync_rollups(csv_file_path, start_date, end_date, table_prefix=None, token=None):
+    """
+    Recompute rollups for the months in a date range and sync the differences
+
+    Only months the range fully covers are rebuilt: the report usually starts
+    mid-month, and rebuilding that month from part of its rows would
+    under-count it and delete groups that only had rows earlier in it.
+
+    Args:
+        csv_file_path: Path to the downloaded report
+        start_date: Start date in format 'YYYY-MM-DD'
+        end_date: End date in format 'YYYY-MM-DD'
+        table_prefix: Column prefix of the raw records (default: TABLE_PREFIX)
+        token: Optional access token to reuse instead of authenticating
+    """
+    logger = get_logger()
+
+    if not ROLLUP_TABLE_NAME:
+        return
+
+    logger.info(f"=== Syncing Rollups to '{ROLLUP_TABLE_NAME}' ===")
+
+    if token is None:
+        logger.info("Authenticating to Dataverse...")
+        token = get_dataverse_token()
+
+    covered = _covered_months(start_date, end_date)
+    if covered is None:
+        logger.info(f"No whole month between {start_date} and {end_date}; rollups left unchanged")
+        return
+    if covered != (start_date, end_date):
+        logger.info(f"Rebuilding rollups for {covered[0]} to {covered[1]}; partial months are left unchanged")
+
+    first_month, last_month = covered[0][:7], covered[1][:7]
+    records = load_records(csv_file_path, covered[0], covered[1], table_prefix)
+    rollups = compute_rollups(records, table_prefix)
+    logger.info(f"Computed {len(rollups)} rollup rows from {len(records)} records")
+
+    primary_key_field = get_primary_key_field(token, ROLLUP_TABLE_NAME)
+    existing = _fetch_existing_rollups(token, primary_key_field, first_month, last_month)
+
+    operations = []
+    unchanged = 0
+    for rollup in rollups:
+        current = existing.pop(_group_key(rollup), None)
+        if current is None:
+            operations.append(("POST", rollup))
+        elif _values_differ(rollup, current):
+            operations.append(("PATCH", (current[primary_key_field], rollup)))
+        else:
+            unchanged += 1
+
+    # Groups that no longer have any rows
+    for row in existing.values():
+        operations.append(("DELETE", row[primary_key_field]))
+
+    counts = {method: sum(1 for op, _ in operations if op == method) for method in ("POST", "PATCH", "DELETE")}
+    logger.info(f"Rollups: {counts['POST']} new, {counts['PATCH']} changed, "
+                f"{counts['DELETE']} removed, {unchanged} unchanged")
+
+    failed = 0
+    for i in range(0, len(operations), BATCH_SIZE):
+        chunk = operations[i:i + BATCH_SIZE]
+        batch_id, batch_body = build_batch_body([chunk], ROLLUP_TABLE_NAME)
+        response = post_batch(token, batch_id, batch_body)
+
+        if not batch_succeeded(response):
+            failed += len(chunk)
+            logger.error(f"  Error syncing rollup batch {i // BATCH_SIZE + 1}: {response.status_code} - {response.text[:500]}")
+
+    logger.info(f"✓ Synced {len(operations) - failed} rollup changes to '{ROLLUP_TABLE_NAME}'")
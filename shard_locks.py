@@ -0,0 +1,194 @@
+"""
+Shard leases in a lock-file directory, for workers on several hosts
+
+Used by shard_sync.py instead of the SQLite lease table when SHARD_LOCK_DIR
+is set. The directory can be a network share every worker host mounts
+(SMB/NFS): claims only rely on exclusive file creation and on renames
+within one directory, which are atomic there, unlike SQLite's byte-range
+locks.
+
+Per shard the directory holds:
+    <shard_id>.json   State (dates, status, attempts, last error)
+    <shard_id>.lock   Lease (owner, expiry); exists while a worker holds it
+
+A state file is only written by the worker holding the shard's lock. An
+expired lock is taken over by renaming it aside first, so only one worker
+wins the takeover. Lease expiry compares wall-clock times written by
+different hosts, so keep their clocks in sync (NTP) and the lease well
+above any drift.
+"""
+
+import json
+import os
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+
+def _now():
+    """Timestamp for the updated_at field"""
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _read_json(path):
+    """Parsed JSON file, or None if it does not exist (or was replaced mid-read)"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    """Replace a JSON file atomically (readers see the old or the new content)"""
+    temp = path.with_name(f"{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    with open(temp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(temp, path)
+
+
+class LockDirLeases:
+    """Shard lease store in a directory of state and lock files"""
+
+    def __init__(self, lock_dir, lease_seconds, max_attempts):
+        self.lock_dir = Path(lock_dir)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock_dir.mkdir(parents=True, exist_ok=True)
+
+    def _state_file(self, shard_id):
+        return self.lock_dir / f"{shard_id}.json"
+
+    def _lock_file(self, shard_id):
+        return self.lock_dir / f"{shard_id}.lock"
+
+    def _lease(self, shard_id):
+        """Current lease of a shard, or None"""
+        return _read_json(self._lock_file(shard_id))
+
+    def plan(self, run_id, csv_path, spans):
+        """
+        Replace every shard with a new plan
+
+        Returns:
+            Number of shards that were still leased by a live worker
+        """
+        now = time.time()
+        active = 0
+        for path in list(self.lock_dir.glob("*.lock")):
+            lease = _read_json(path)
+            if lease and lease["lease_expires"] > now:
+                active += 1
+        for pattern in ("*.json", "*.lock", "*.stale", "*.tmp"):
+            for path in self.lock_dir.glob(pattern):
+                path.unlink(missing_ok=True)
+
+        for start, end in spans:
+            shard_id = f"{start}..{end}"
+            _write_json(self._state_file(shard_id), {
+                "shard_id": shard_id, "run_id": run_id, "csv_path": csv_path,
+                "start_date": start, "end_date": end, "status": "pending",
+                "attempts": 0, "last_error": None, "updated_at": _now()
+            })
+        return active
+
+    def _take_lock(self, shard_id, owner):
+        """Create the shard's lock file, taking over an expired one; True on success"""
+        lock_file = self._lock_file(shard_id)
+        lease = {"owner": owner, "lease_expires": time.time() + self.lease_seconds}
+
+        for _ in range(2):
+            try:
+                fd = os.open(lock_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                current = self._lease(shard_id)
+                if current is not None and current["lease_expires"] >= time.time():
+                    return False
+                # Expired (or unreadable): move it aside; only one worker's rename succeeds
+                stale = lock_file.with_name(f"{lock_file.name}.{uuid.uuid4().hex[:8]}.stale")
+                try:
+                    os.rename(lock_file, stale)
+                    stale.unlink()
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(lease, f)
+            return True
+        return False
+
+    def _release_lock(self, shard_id, owner):
+        """Remove the shard's lock if it is still ours"""
+        lease = self._lease(shard_id)
+        if lease and lease["owner"] == owner:
+            self._lock_file(shard_id).unlink(missing_ok=True)
+
+    def _claimable(self, state, now):
+        if state["attempts"] >= self.max_attempts:
+            return False
+        if state["status"] in ("pending", "failed"):
+            return True
+        if state["status"] == "leased":
+            lease = self._lease(state["shard_id"])
+            return lease is None or lease["lease_expires"] < now
+        return False
+
+    def claim(self, owner):
+        """Lease the next claimable shard; returns its state, or None"""
+        now = time.time()
+        candidates = [state for state in self.rows() if self._claimable(state, now)]
+        candidates.sort(key=lambda state: (state["attempts"], state["start_date"]))
+
+        for state in candidates:
+            shard_id = state["shard_id"]
+            if not self._take_lock(shard_id, owner):
+                continue
+
+            # Re-read under the lock: another worker may have finished it meanwhile
+            state = _read_json(self._state_file(shard_id))
+            if state is None or state["status"] == "done" or state["attempts"] >= self.max_attempts:
+                self._release_lock(shard_id, owner)
+                continue
+
+            state.update(status="leased", owner=owner, attempts=state["attempts"] + 1, updated_at=_now())
+            _write_json(self._state_file(shard_id), state)
+            state["lease_expires"] = self._lease(shard_id)["lease_expires"]
+            return state
+        return None
+
+    def renew(self, shard_id, owner):
+        """Extend a lease; returns False if the shard is no longer ours"""
+        lease = self._lease(shard_id)
+        if lease is None or lease["owner"] != owner:
+            return False
+        _write_json(self._lock_file(shard_id), {"owner": owner, "lease_expires": time.time() + self.lease_seconds})
+        return True
+
+    def finish(self, shard_id, owner, error=None):
+        """Mark a leased shard done (or failed with an error message)"""
+        lease = self._lease(shard_id)
+        if lease is None or lease["owner"] != owner:
+            return False
+
+        state = _read_json(self._state_file(shard_id))
+        state.update(status="failed" if error else "done", last_error=error, updated_at=_now())
+        _write_json(self._state_file(shard_id), state)
+        self._release_lock(shard_id, owner)
+        return True
+
+    def rows(self):
+        """Every shard's state, with owner and lease_expires from its lock file"""
+        rows = []
+        for path in sorted(self.lock_dir.glob("*.json")):
+            state = _read_json(path)
+            if state is None:
+                continue
+            lease = self._lease(state["shard_id"]) if state["status"] == "leased" else None
+            state["owner"] = lease["owner"] if lease else state.get("owner")
+            state["lease_expires"] = lease["lease_expires"] if lease else 0
+            rows.append(state)
+        return sorted(rows, key=lambda state: state["start_date"])
+
+    def close(self):
+        pass
@@ -0,0 +1,466 @@
+"""
+Sharded sync across worker processes and hosts
+
+The sync window is split into date shards (SHARD_DAYS each) recorded in a
+lease store. Any number of worker processes claim shards one at a time, run
+the delete + upload (or replace, per SYNC_MODE) for that date range with
+their own Dataverse sign-in, and mark them done.
+
+The lease store is a SQLite file (SHARD_DB_FILE) for workers on one
+machine, or, when SHARD_LOCK_DIR is set, a directory of lock files that
+workers on several hosts share over a network drive (see shard_locks.py).
+
+A worker holds a lease on its shard and renews it while working. If it
+crashes or stalls, the lease expires after SHARD_LEASE_SECONDS and another
+worker picks the shard up; a worker that finds its lease gone stops before
+its next delete or upload step instead of racing the new owner. Failed shards are retried by any
+worker up to SHARD_MAX_ATTEMPTS times.
+
+Usage:
+    python cli.py shard-plan [CSV] [--start D --end D]   Split the window into shards
+    python cli.py shard-worker                           Work until no shards are left
+    python cli.py shard-status                           Show the lease table
+
+The SQLite file must be on a local disk: its locking is not reliable on
+network shares (SMB/NFS), where two hosts could claim the same shard.
+
+Dataverse throttles per user, and the client-side rate limit is shared per
+DATAVERSE_USERNAME, so workers signed in as the same user cannot go past
+one user's limit together. Give each worker its own account by setting
+DATAVERSE_USERNAME / DATAVERSE_PASSWORD in its environment (they take
+precedence over .env).
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from dataverse_client import (
+    get_dataverse_token,
+    upload_to_dataverse,
+    delete_records_in_date_range,
+    replace_records_in_date_range
+)
+from config import (
+    SHARD_DB_FILE,
+    SHARD_LOCK_DIR,
+    SHARD_DAYS,
+    SHARD_LEASE_SECONDS,
+    SHARD_MAX_ATTEMPTS,
+    SYNC_MODE
+)
+from logger import get_logger
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS shards (
+    shard_id      TEXT PRIMARY KEY,
+    run_id        TEXT NOT NULL,
+    csv_path      TEXT NOT NULL,
+    start_date    TEXT NOT NULL,
+    end_date      TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    owner         TEXT,
+    lease_expires REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    last_error    TEXT,
+    updated_at    TEXT
+)
+"""
+
+
+def connect(db_path=None):
+    """
+    Open the lease database
+
+    Autocommit mode, so claims can take the write lock with BEGIN IMMEDIATE.
+    """
+    if db_path is None:
+        db_path = SHARD_DB_FILE
+
+    conn = sqlite3.connect(str(db_path), timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute(SCHEMA)
+    return conn
+
+
+def _now():
+    """Timestamp for the updated_at column"""
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def split_date_range(start_date, end_date, shard_days=None):
+    """
+    Split an inclusive date range into consecutive spans
+
+    Returns:
+        List of (start_date, end_date) tuples (YYYY-MM-DD)
+    """
+    if shard_days is None:
+        shard_days = SHARD_DAYS
+
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+
+    spans = []
+    while start <= end:
+        shard_end = min(start + timedelta(days=shard_days - 1), end)
+        spans.append((start.strftime("%Y-%m-%d"), shard_end.strftime("%Y-%m-%d")))
+        start = shard_end + timedelta(days=1)
+    return spans
+
+
+def plan_shards(csv_file_path, start_date, end_date, shard_days=None, db_path=None):
+    """
+    Replace the lease table with a new set of shards for a sync window
+
+    Args:
+        csv_file_path: Report every worker will read (must be reachable by all of them)
+        start_date: Start date in format 'YYYY-MM-DD'
+        end_date: End date in format 'YYYY-MM-DD'
+        shard_days: Days per shard (default: SHARD_DAYS from config)
+        db_path: Lease database (default: SHARD_DB_FILE from config)
+
+    Returns:
+        Number of shards created
+    """
+    logger = get_logger()
+
+    run_id = uuid.uuid4().hex[:12]
+    spans = split_date_range(start_date, end_date, shard_days)
+    csv_file_path = str(Path(csv_file_path).resolve())
+
+    leases = open_leases(db_path)
+    try:
+        active = leases.plan(run_id, csv_file_path, spans)
+    finally:
+        leases.close()
+
+    if active:
+        logger.warning(f"{active} shards of the previous plan were still leased; "
+                       f"their workers will not be able to complete them")
+
+    logger.info(f"Planned {len(spans)} shards for {start_date} to {end_date} (run {run_id})")
+    return len(spans)
+
+
+def claim_shard(conn, owner, lease_seconds=None, max_attempts=None):
+    """
+    Lease the next shard that is pending, expired or failed with retries left
+
+    Returns:
+        The shard row, or None if nothing is claimable right now
+    """
+    if lease_seconds is None:
+        lease_seconds = SHARD_LEASE_SECONDS
+    if max_attempts is None:
+        max_attempts = SHARD_MAX_ATTEMPTS
+
+    now = time.time()
+    # BEGIN IMMEDIATE takes the write lock, so two workers never claim the same shard
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        shard = conn.execute(
+            "SELECT * FROM shards WHERE attempts < ? AND ("
+            "  status = 'pending'"
+            "  OR status = 'failed'"
+            "  OR (status = 'leased' AND lease_expires < ?)"
+            ") ORDER BY attempts, start_date LIMIT 1",
+            (max_attempts, now)
+        ).fetchone()
+
+        if shard is not None:
+            conn.execute(
+                "UPDATE shards SET status = 'leased', owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1, updated_at = ? WHERE shard_id = ?",
+                (owner, now + lease_seconds, _now(), shard["shard_id"])
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+    if shard is None:
+        return None
+    return conn.execute("SELECT * FROM shards WHERE shard_id = ?", (shard["shard_id"],)).fetchone()
+
+
+def renew_lease(conn, shard_id, owner, lease_seconds=None):
+    """Extend a lease; returns False if the shard is no longer ours"""
+    if lease_seconds is None:
+        lease_seconds = SHARD_LEASE_SECONDS
+
+    cursor = conn.execute(
+        "UPDATE shards SET lease_expires = ? WHERE shard_id = ? AND owner = ? AND status = 'leased'",
+        (time.time() + lease_seconds, shard_id, owner)
+    )
+    return cursor.rowcount == 1
+
+
+def finish_shard(conn, shard_id, owner, error=None):
+    """Mark a leased shard done (or failed with an error message)"""
+    cursor = conn.execute(
+        "UPDATE shards SET status = ?, lease_expires = NULL, last_error = ?, updated_at = ? "
+        "WHERE shard_id = ? AND owner = ? AND status = 'leased'",
+        ("failed" if error else "done", error, _now(), shard_id, owner)
+    )
+    return cursor.rowcount == 1
+
+
+def shard_counts(leases, max_attempts=None):
+    """
+    Count shards by state
+
+    Args:
+        leases: Lease store from open_leases()
+
+    Returns:
+        Dict with done, pending, leased (live lease), failed (retries left)
+        and abandoned (no attempts left) counts
+    """
+    if max_attempts is None:
+        max_attempts = SHARD_MAX_ATTEMPTS
+
+    now = time.time()
+    counts = {"done": 0, "pending": 0, "leased": 0, "failed": 0, "abandoned": 0}
+    for row in leases.rows():
+        status = row["status"]
+        if status == "leased" and row["lease_expires"] < now:
+            # The worker went away without finishing
+            status = "failed"
+        if status == "failed" and row["attempts"] >= max_attempts:
+            status = "abandoned"
+        counts[status] += 1
+    return counts
+
+
+class _SQLiteLeases:
+    """Lease table in a SQLite file, for workers on one machine"""
+
+    def __init__(self, db_path):
+        self.conn = connect(db_path)
+
+    def plan(self, run_id, csv_path, spans):
+        """Replace the lease table; returns how many shards were still leased"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            active = conn.execute("SELECT COUNT(*) FROM shards WHERE status = 'leased' AND lease_expires > ?",
+                                  (time.time(),)).fetchone()[0]
+            conn.execute("DELETE FROM shards")
+            conn.executemany(
+                "INSERT INTO shards (shard_id, run_id, csv_path, start_date, end_date, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(f"{start}..{end}", run_id, csv_path, start, end, _now()) for start, end in spans]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return active
+
+    def claim(self, owner):
+        return claim_shard(self.conn, owner)
+
+    def renew(self, shard_id, owner):
+        return renew_lease(self.conn, shard_id, owner)
+
+    def finish(self, shard_id, owner, error=None):
+        return finish_shard(self.conn, shard_id, owner, error)
+
+    def rows(self):
+        return self.conn.execute("SELECT * FROM shards ORDER BY start_date").fetchall()
+
+    def close(self):
+        self.conn.close()
+
+
+def open_leases(db_path=None):
+    """
+    Open the lease store: the lock-file directory if SHARD_LOCK_DIR is set,
+    else the SQLite lease table
+
+    Both have plan(), claim(), renew(), finish(), rows() and close().
+    """
+    if SHARD_LOCK_DIR:
+        from shard_locks import LockDirLeases
+
+        return LockDirLeases(SHARD_LOCK_DIR, SHARD_LEASE_SECONDS, SHARD_MAX_ATTEMPTS)
+    return _SQLiteLeases(db_path if db_path is not None else SHARD_DB_FILE)
+
+
+class _LeaseKeeper:
+    """Background thread that renews a shard lease while it is being synced"""
+
+    def __init__(self, db_path, shard_id, owner, lease_seconds):
+        self.db_path = db_path
+        self.shard_id = shard_id
+        self.owner = owner
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self.renewed_at = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="lease-keeper", daemon=True)
+
+    def _run(self):
+        # sqlite3 connections must stay on the thread that opened them
+        leases = open_leases(self.db_path)
+        try:
+            while not self._stop.wait(self.lease_seconds / 3):
+                try:
+                    if not leases.renew(self.shard_id, self.owner):
+                        self.lost = True
+                        get_logger().warning(f"Lost the lease on shard {self.shard_id}")
+                        return
+                    self.renewed_at = time.monotonic()
+                except (sqlite3.Error, OSError) as e:
+                    get_logger().warning(f"Could not renew lease on shard {self.shard_id}: {str(e)}")
+                    if time.monotonic() - self.renewed_at >= self.lease_seconds:
+                        # Another worker may already have taken the shard over
+                        self.lost = True
+                        get_logger().warning(f"Lease on shard {self.shard_id} expired without renewal")
+                        return
+        finally:
+            leases.close()
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def sync_shard(shard, token, keeper=None):
+    """
+    Sync one shard's date range
+
+    Args:
+        shard: Row from claim_shard()
+        token: Access token
+        keeper: _LeaseKeeper of the shard; work stops before the next step
+            once its lease is lost, since the new owner is syncing the same dates
+
+    Returns:
+        True if every delete/upload/replace batch succeeded
+    """
+    csv_path, start_date, end_date = shard["csv_path"], shard["start_date"], shard["end_date"]
+
+    def lease_lost():
+        if keeper is not None and keeper.lost:
+            get_logger().warning(f"[{shard['shard_id']}] Lease lost; stopping before the next step")
+            return True
+        return False
+
+    if lease_lost():
+        return False
+
+    if SYNC_MODE == "replace":
+        return replace_records_in_date_range(csv_path, start_date, end_date, token=token)
+
+    # Never upload over rows that could not be deleted; a retry starts with the delete again
+    if not delete_records_in_date_range(start_date, end_date, token=token):
+        return False
+    if lease_lost():
+        return False
+    return upload_to_dataverse(csv_path, start_date=start_date, end_date=end_date, token=token)
+
+
+def run_worker(worker_id=None, db_path=None, poll_seconds=15):
+    """
+    Claim and sync shards until none are left
+
+    Waits while other workers hold leases, so shards they abandon are
+    picked up.
+
+    Args:
+        worker_id: Name in the lease table (default: host:pid)
+        db_path: Lease database (default: SHARD_DB_FILE from config)
+        poll_seconds: Wait between claims while other workers hold leases
+
+    Returns:
+        Number of shards this worker failed
+    """
+    logger = get_logger()
+
+    if db_path is None:
+        db_path = SHARD_DB_FILE
+    if worker_id is None:
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+    logger.info(f"=== Shard worker {worker_id} started ({SHARD_LOCK_DIR or db_path}) ===")
+
+    # One sign-in per worker, refreshed silently by MSAL when it nears expiry
+    token = get_dataverse_token()
+
+    done = failed = 0
+    leases = open_leases(db_path)
+    try:
+        while True:
+            shard = leases.claim(worker_id)
+
+            if shard is None:
+                counts = shard_counts(leases)
+                if counts["pending"] or counts["leased"] or counts["failed"]:
+                    logger.info(f"No shard available, {counts['leased']} leased by other workers; waiting...")
+                    time.sleep(poll_seconds)
+                    continue
+                break
+
+            shard_id = shard["shard_id"]
+            logger.info(f"[{shard_id}] Claimed (attempt {shard['attempts']})")
+
+            error = None
+            with _LeaseKeeper(db_path, shard_id, worker_id, SHARD_LEASE_SECONDS) as keeper:
+                try:
+                    token = get_dataverse_token()
+                    if not sync_shard(shard, token, keeper):
+                        error = "one or more batches failed"
+                except Exception as e:
+                    error = str(e)
+                    logger.error(f"[{shard_id}] Sync failed: {error}", exc_info=True)
+
+            if keeper.lost:
+                logger.warning(f"[{shard_id}] Lease was taken over; result not recorded")
+                continue
+
+            leases.finish(shard_id, worker_id, error)
+            if error:
+                failed += 1
+                logger.error(f"[{shard_id}] Failed: {error}")
+            else:
+                done += 1
+                logger.info(f"[{shard_id}] Done")
+    finally:
+        leases.close()
+
+    logger.info(f"=== Shard worker {worker_id} finished: {done} done, {failed} failed ===")
+    return failed
+
+
+def log_status(db_path=None):
+    """Log every shard and the totals by state"""
+    logger = get_logger()
+
+    leases = open_leases(db_path)
+    try:
+        now = time.time()
+        for row in leases.rows():
+            lease = ""
+            if row["status"] == "leased":
+                remaining = row["lease_expires"] - now
+                lease = f" by {row['owner']} ({remaining:.0f}s left)" if remaining > 0 else f" by {row['owner']} (expired)"
+            error = f" - {row['last_error']}" if row["last_error"] else ""
+            logger.info(f"  {row['shard_id']}: {row['status']}{lease}, attempts {row['attempts']}{error}")
+
+        counts = shard_counts(leases)
+    finally:
+        leases.close()
+
+    logger.info(", ".join(f"{count} {state}" for state, count in counts.items()))
+    return counts
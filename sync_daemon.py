@@ -0,0 +1,284 @@
+"""
+Long-running sync service
+
+Runs the main.py sync on a schedule (DAEMON_INTERVAL_MINUTES) and whenever
+the trigger file (DAEMON_TRIGGER_FILE) appears or POST /trigger is called,
+without restarting Python between runs. The MSAL token cache, the HTTP
+connection pool and, with DAEMON_KEEP_BROWSER, the signed-in Chrome context
+stay warm from one run to the next.
+
+Status endpoint (127.0.0.1 only):
+    GET  /health    200 "ok" while the daemon is up
+    GET  /status    JSON with the state of the current and last run
+    POST /trigger   Start a run as soon as the current one (if any) finishes
+
+Usage:
+    python sync_daemon.py
+    python cli.py daemon
+"""
+
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import (
+    DATAVERSE_USERNAME,
+    DATAVERSE_PASSWORD,
+    DAEMON_INTERVAL_MINUTES,
+    DAEMON_TRIGGER_FILE,
+    DAEMON_STATUS_PORT,
+    DAEMON_KEEP_BROWSER,
+    DAEMON_REFRESH_REPORT
+)
+from logger import setup_logger, get_logger
+
+
+class SyncDaemon:
+    """Scheduler, run state and warm resources shared across runs"""
+
+    def __init__(self, interval_minutes=None, trigger_file=None, keep_browser=None, refresh_report=None):
+        self.interval = (DAEMON_INTERVAL_MINUTES if interval_minutes is None else interval_minutes) * 60
+        self.trigger_file = DAEMON_TRIGGER_FILE if trigger_file is None else trigger_file
+        self.keep_browser = DAEMON_KEEP_BROWSER if keep_browser is None else keep_browser
+        self.refresh_report = DAEMON_REFRESH_REPORT if refresh_report is None else refresh_report
+
+        self.trigger_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.lock = threading.Lock()
+        self.state = {
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "running": False,
+            "runs": 0,
+            "failures": 0,
+            "last_started": None,
+            "last_finished": None,
+            "last_duration_seconds": None,
+            "last_status": None,
+            "last_error": None,
+            "next_run": None
+        }
+
+        # Playwright objects must stay on the thread that created them (the run loop)
+        self._playwright = None
+        self._browser = None
+        self._browser_context = None
+
+    def status(self):
+        """Snapshot of the run state for the status endpoint"""
+        with self.lock:
+            return dict(self.state)
+
+    def trigger(self):
+        """Request a run as soon as possible"""
+        self.trigger_event.set()
+
+    def stop(self):
+        """Ask the run loop to exit after the current run"""
+        self.stop_event.set()
+        self.trigger_event.set()
+
+    def _get_browser_context(self):
+        """Open (once) and return the warm browser context, or None if disabled"""
+        if not self.keep_browser:
+            return None
+
+        if self._browser_context is None:
+            from playwright.sync_api import sync_playwright
+            from unanet_downloader import launch_browser
+
+            get_logger().info("Launching browser (kept open between runs)...")
+            self._playwright = sync_playwright().start()
+            self._browser, self._browser_context = launch_browser(self._playwright)
+
+        return self._browser_context
+
+    def close_browser(self):
+        """Close the warm browser; the next run launches a new one"""
+        if self._browser is not None:
+            try:
+                self._browser.close()
+            except Exception:
+                pass
+        if self._playwright is not None:
+            try:
+                self._playwright.stop()
+            except Exception:
+                pass
+        self._playwright = self._browser = self._browser_context = None
+
+    def warm_up(self):
+        """Sign in to Dataverse and open the connection pool before the first run"""
+        from dataverse_client import get_dataverse_token, get_session
+
+        logger = get_logger()
+        if DATAVERSE_USERNAME and DATAVERSE_PASSWORD:
+            try:
+                get_dataverse_token()
+                logger.info("Dataverse token acquired")
+            except Exception as e:
+                logger.warning(f"Could not acquire Dataverse token at startup: {str(e)}")
+        get_session()
+
+    def run_once(self, reason):
+        """Run one sync, recording the outcome instead of raising"""
+        from main import main as run_sync
+
+        logger = get_logger()
+        started = time.monotonic()
+        with self.lock:
+            self.state["running"] = True
+            self.state["last_started"] = datetime.now().isoformat(timespec="seconds")
+
+        logger.info(f"=== Daemon run started ({reason}) ===")
+        error = None
+        try:
+            run_sync(setup_logging=False,
+                     browser_context=self._get_browser_context(),
+                     force_download=self.refresh_report)
+        except Exception as e:
+            error = str(e)
+            logger.error(f"Daemon run failed: {error}", exc_info=True)
+            # A broken page or lost browser should not poison the next run
+            self.close_browser()
+
+        duration = time.monotonic() - started
+        with self.lock:
+            self.state["running"] = False
+            self.state["runs"] += 1
+            self.state["last_finished"] = datetime.now().isoformat(timespec="seconds")
+            self.state["last_duration_seconds"] = round(duration, 1)
+            self.state["last_status"] = "failed" if error else "ok"
+            self.state["last_error"] = error
+            if error:
+                self.state["failures"] += 1
+
+        logger.info(f"=== Daemon run finished in {duration:.0f}s ({'failed' if error else 'ok'}) ===")
+
+    def _next_run_time(self, last_run):
+        """Monotonic time of the next scheduled run, or None if unscheduled"""
+        if self.interval <= 0:
+            return None
+        return last_run + self.interval
+
+    def run_forever(self, run_at_start=True):
+        """
+        Run syncs until stop() is called or the process is interrupted
+
+        Args:
+            run_at_start: Run a sync immediately instead of waiting one interval
+        """
+        logger = get_logger()
+
+        next_run = self._next_run_time(time.monotonic())
+        try:
+            while not self.stop_event.is_set():
+                reason = None
+                if run_at_start:
+                    run_at_start = False
+                    reason = "startup"
+                elif self.trigger_file.exists():
+                    self.trigger_file.unlink(missing_ok=True)
+                    reason = f"trigger file {self.trigger_file.name}"
+                elif self.trigger_event.is_set():
+                    reason = "trigger request"
+                elif next_run is not None and time.monotonic() >= next_run:
+                    reason = "schedule"
+
+                if reason is None:
+                    # Poll the trigger file once a second; /trigger wakes us up early
+                    self.trigger_event.wait(1.0)
+                    continue
+
+                self.trigger_event.clear()
+                self.run_once(reason)
+
+                next_run = self._next_run_time(time.monotonic())
+                with self.lock:
+                    self.state["next_run"] = None if next_run is None else (
+                        datetime.now() + timedelta(seconds=self.interval)).isoformat(timespec="seconds")
+        except KeyboardInterrupt:
+            logger.info("Daemon interrupted")
+        finally:
+            self.close_browser()
+
+
+def _make_handler(daemon):
+    """Build the status request handler bound to a daemon"""
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def _send(self, code, body, content_type="application/json"):
+            data = body.encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._send(200, "ok", "text/plain")
+            elif self.path == "/status":
+                self._send(200, json.dumps(daemon.status()))
+            else:
+                self._send(404, json.dumps({"error": "not found"}))
+
+        def do_POST(self):
+            if self.path == "/trigger":
+                daemon.trigger()
+                self._send(202, json.dumps({"triggered": True}))
+            else:
+                self._send(404, json.dumps({"error": "not found"}))
+
+        def log_message(self, format, *args):
+            # Keep polling of /health out of the sync log
+            pass
+
+    return StatusHandler
+
+
+def start_status_server(daemon, port=None):
+    """
+    Serve the status endpoint on 127.0.0.1 in a background thread
+
+    Returns:
+        The server (call shutdown() to stop it), or None if the port is 0
+    """
+    if port is None:
+        port = DAEMON_STATUS_PORT
+    if not port:
+        return None
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), _make_handler(daemon))
+    thread = threading.Thread(target=server.serve_forever, name="status-server", daemon=True)
+    thread.start()
+    get_logger().info(f"Status endpoint: http://127.0.0.1:{server.server_port}/status")
+    return server
+
+
+def run_daemon(setup_logging=True, run_at_start=True):
+    """
+    Start the status endpoint and run syncs until interrupted
+
+    Args:
+        setup_logging: Configure logging (False when the caller already did)
+        run_at_start: Run a sync immediately instead of waiting one interval
+    """
+    logger = setup_logger() if setup_logging else get_logger()
+
+    daemon = SyncDaemon()
+    schedule = f"every {daemon.interval / 60:g} minutes" if daemon.interval > 0 else "on trigger only"
+    logger.info(f"=== Sync daemon started ({schedule}, trigger file: {daemon.trigger_file}) ===")
+
+    server = start_status_server(daemon)
+    daemon.warm_up()
+    try:
+        daemon.run_forever(run_at_start=run_at_start)
+    finally:
+        if server is not None:
+            server.shutdown()
+        logger.info("=== Sync daemon stopped ===")
+
+
+if __name__ == "__main__":
+    run_daemon()
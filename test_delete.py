@@ -5,7 +5,10 @@ This will show how many records would be deleted without actually deleting them
 
 import requests
 from dataverse_client import get_dataverse_token
+from dataverse_planning import plan_delete
+from dataverse_metadata import get_primary_key_field
 from config import DATAVERSE_URL, TABLE_NAME, TABLE_PREFIX
+from rate_limiter import acquire
 
 def test_delete_query(date_string, date_field_name=None):
     """
@@ -35,11 +38,12 @@ def test_delete_query(date_string, date_field_name=None):
     }
 
     # Query for records after the specified date
-    primary_key_field = f"{TABLE_NAME.rstrip('s')}id"
+    primary_key_field = get_primary_key_field(token, TABLE_NAME)
     filter_query = f"?$filter={date_field_name} gt '{date_string}'&$select={primary_key_field},{date_field_name}&$top=10"
     url = f"{DATAVERSE_URL}/api/data/v9.2/{TABLE_NAME}{filter_query}"
 
     print(f"Fetching sample records where {date_field_name} > {date_string}...")
+    acquire()
     response = requests.get(url, headers=headers)
 
     if response.status_code != 200:
@@ -57,16 +61,18 @@ def test_delete_query(date_string, date_field_name=None):
         record_date = record.get(date_field_name, 'N/A')
         print(f"{i}. ID: {record_id[:8]}... | Date: {record_date}")
 
-    # Get total count
-    count_url = f"{DATAVERSE_URL}/api/data/v9.2/{TABLE_NAME}?$filter={date_field_name} gt '{date_string}'&$count=true&$top=0"
-    count_response = requests.get(count_url, headers=headers)
-
-    if count_response.status_code == 200:
-        total_count = count_response.json().get('@odata.count', 0)
-        print("-" * 60)
-        print(f"\nTOTAL RECORDS THAT WOULD BE DELETED: {total_count}")
+    # Get total count and per-month distribution in one aggregate request
+    try:
+        plan = plan_delete(after_date=date_string, date_field_name=date_field_name, token=token)
+    except RuntimeError as e:
+        print(f"\nCould not get total count: {e}")
     else:
-        print("\nCould not get total count")
+        print("-" * 60)
+        print("\nRecords by month:")
+        for month, count in plan["by_month"].items():
+            print(f"  {month}: {count}")
+        print(f"\nTOTAL RECORDS THAT WOULD BE DELETED: {plan['total']}")
+        print(f"Estimated delete: {plan['batches']} batch requests, ~{plan['minutes']} minutes")
 
     print("\n" + "="*60)
     print("This was a TEST - NO records were deleted")
@@ -5,6 +5,7 @@ Test upload with a single record to see the full error message
 import requests
 from dataverse_client import get_dataverse_token, map_csv_row_to_dataverse
 from config import DATAVERSE_URL, TABLE_NAME, DOWNLOAD_DIR
+from rate_limiter import acquire
 import csv
 from datetime import datetime
 
@@ -44,7 +45,8 @@ headers = {
 url = f"{DATAVERSE_URL}/api/data/v9.2/{TABLE_NAME}"
 print(f"\nPosting to: {url}")
 
-response = requests.post(url, headers=headers, json=data)
+acquire()
+response = requests.post(url, headers=headers, json=data.to_dict())
 
 print(f"\nStatus: {response.status_code}")
 if response.status_code in [200, 201, 204]:
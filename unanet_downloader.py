@@ -1,75 +1,319 @@
-from playwright.sync_api import sync_playwright
-from datetime import datetime
+import codecs
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from pathlib import Path
 from config import (
     UNANET_URL,
     UNANET_USERNAME,
     UNANET_PASSWORD,
     UNANET_REPORT_ID,
+    UNANET_REPORT_TIMEOUT_SECONDS,
+    UNANET_DOWNLOAD_SLICES,
+    UNANET_DOWNLOAD_WORKERS,
+    UNANET_CRITERIA_SELECTOR,
+    UNANET_BEGIN_DATE_SELECTOR,
+    UNANET_END_DATE_SELECTOR,
+    UNANET_RUN_SELECTOR,
+    UNANET_DATE_FORMAT,
     DOWNLOAD_DIR
 )
 from logger import get_logger
 
 
-def download_report():
-    """Download report from Unanet or use existing file from today"""
-    logger = get_logger()
+def launch_browser(playwright):
+    """
+    Launch Chrome and open a download-enabled browser context
 
-    # Create reports directory if it doesn't exist
-    DOWNLOAD_DIR.mkdir(exist_ok=True)
+    Args:
+        playwright: A started Playwright instance
 
-    today = datetime.now().strftime("%Y-%m-%d")
-    final_path = DOWNLOAD_DIR / f"unanet_report_{today}.csv"
+    Returns:
+        Tuple of (browser, context)
+    """
+    # Use system Chrome instead of Playwright's bundled Chromium
+    browser = playwright.chromium.launch(
+        headless=False,
+        channel="chrome"  # Use installed Chrome browser
+    )
+    context = browser.new_context(accept_downloads=True)
+    return browser, context
 
-    # Check if today's report already exists
-    if final_path.exists():
-        logger.info(f"Found existing report from today: {final_path}")
-        logger.info("Using existing file instead of downloading from Unanet")
-        return final_path
 
-    # Download from Unanet if no file exists for today
-    logger.info("No report found for today, downloading from Unanet...")
+def _download_with_context(context, report_id, final_path, start_date=None, end_date=None):
+    """
+    Run a saved report in an open browser context and save the CSV
+
+    With start_date/end_date the report is run from its criteria form with
+    that date range instead of its saved criteria.
+    """
+    logger = get_logger()
+
+    page = context.new_page()
     try:
-        with sync_playwright() as p:
-            # Use system Chrome instead of Playwright's bundled Chromium
-            browser = p.chromium.launch(
-                headless=False,
-                channel="chrome"  # Use installed Chrome browser
-            )
-            context = browser.new_context(accept_downloads=True)
-            page = context.new_page()
-
-            # === LOGIN ===
+        # === LOGIN ===
+        # A warm context (sync daemon) usually still has a session
+        page.goto(f"{UNANET_URL}/goaztech/")
+        if page.query_selector('input[name="username"]'):
             logger.info(f"Logging into Unanet at {UNANET_URL}")
-            page.goto(f"{UNANET_URL}/goaztech/")
             page.fill('input[name="username"]', UNANET_USERNAME)
             page.fill('input[name="password"]', UNANET_PASSWORD)
             page.click('#button_ok')
             page.wait_for_load_state("networkidle")
             logger.info("Login successful")
+        else:
+            logger.info("Reusing existing Unanet session")
 
-            # === SAVED REPORTS PAGE ===
-            page.goto(f"{UNANET_URL}/goaztech/action/reports/saved")
+        # === SAVED REPORTS PAGE ===
+        page.goto(f"{UNANET_URL}/goaztech/action/reports/saved")
 
+        if start_date is None:
             # === CLICK RUN ON REPORT ===
-            logger.info(f"Clicking run on saved report {UNANET_REPORT_ID}...")
-            page.click(f'tr#{UNANET_REPORT_ID} td.icon a[href*="runReport"]')
+            logger.info(f"Clicking run on saved report {report_id}...")
+            page.click(f'tr#{report_id} td.icon a[href*="runReport"]')
+        else:
+            # === RUN WITH A DATE RANGE ===
+            logger.info(f"Running saved report {report_id} for {start_date} to {end_date}...")
+            page.click(UNANET_CRITERIA_SELECTOR.format(report_id=report_id))
+            page.fill(UNANET_BEGIN_DATE_SELECTOR, _criteria_date(start_date))
+            page.fill(UNANET_END_DATE_SELECTOR, _criteria_date(end_date))
+            page.click(UNANET_RUN_SELECTOR)
+
+        # === WAIT FOR REPORT PAGE TO LOAD ===
+        logger.info("Waiting for report data to load...")
+        page.wait_for_selector('a[href*="doCSVFile"]', timeout=UNANET_REPORT_TIMEOUT_SECONDS * 1000)
+
+        # === DOWNLOAD CSV ===
+        logger.info("Downloading CSV...")
+        with page.expect_download() as download_info:
+            page.click('a[href*="doCSVFile"]')
+
+        download = download_info.value
+        download.save_as(final_path)
+        logger.info(f"Downloaded to: {final_path}")
+    finally:
+        page.close()
+
+
+def _criteria_date(date_string):
+    """YYYY-MM-DD in the format the report criteria form expects"""
+    return datetime.strptime(date_string, "%Y-%m-%d").strftime(UNANET_DATE_FORMAT)
+
+
+def split_window(start_date, end_date, slices):
+    """
+    Split an inclusive date range into at most `slices` consecutive spans of similar length
+
+    Returns:
+        List of (start_date, end_date) tuples (YYYY-MM-DD)
+    """
+    start = datetime.strptime(start_date, "%Y-%m-%d")
+    end = datetime.strptime(end_date, "%Y-%m-%d")
+    total_days = (end - start).days + 1
+    slices = max(1, min(slices, total_days))
+
+    spans = []
+    for index in range(slices):
+        first = start + timedelta(days=total_days * index // slices)
+        last = start + timedelta(days=total_days * (index + 1) // slices - 1)
+        spans.append((first.strftime("%Y-%m-%d"), last.strftime("%Y-%m-%d")))
+    return spans
+
+
+def _download_slice(report_id, start_date, end_date, slice_path):
+    """Download one date slice with its own Playwright instance and browser"""
+    from playwright.sync_api import sync_playwright
+
+    # Playwright objects are bound to the thread that started them
+    with sync_playwright() as p:
+        browser, context = launch_browser(p)
+        try:
+            _download_with_context(context, report_id, slice_path, start_date, end_date)
+        finally:
+            browser.close()
+    return slice_path
+
+
+def _header_key(line):
+    """Header line without a UTF-8 byte order mark or line ending"""
+    return line.removeprefix(codecs.BOM_UTF8).rstrip(b"\r\n")
+
+
+def merge_csv_files(paths, output_path):
+    """
+    Concatenate CSV exports that share a header into one file
+
+    The header is written once; rows are copied as-is, in the given order.
+    """
+    temp_path = output_path.with_name(output_path.name + ".tmp")
+    header = None
+
+    with open(temp_path, 'wb') as out:
+        for path in paths:
+            with open(path, 'rb') as f:
+                first_line = f.readline()
+                if header is None:
+                    header = first_line
+                    out.write(first_line)
+                elif _header_key(first_line) != _header_key(header):
+                    raise ValueError(f"Column header of {path} differs from {paths[0]}")
+
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    data += b"\r\n"
+                out.write(data)
+
+    os.replace(temp_path, output_path)
+
+
+def _download_sliced(report_id, final_path, start_date, end_date, slices):
+    """Download a date window as concurrent slices and merge them into final_path"""
+    logger = get_logger()
+
+    spans = split_window(start_date, end_date, slices)
+    slice_paths = [final_path.with_name(f"{final_path.stem}.part{index + 1}.csv") for index in range(len(spans))]
+    workers = max(1, min(UNANET_DOWNLOAD_WORKERS, len(spans)))
+    logger.info(f"Downloading {start_date} to {end_date} in {len(spans)} slices ({workers} browsers at once)")
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download-slice") as pool:
+            futures = [pool.submit(_download_slice, report_id, span_start, span_end, slice_path)
+                       for (span_start, span_end), slice_path in zip(spans, slice_paths)]
+            # Wait for every slice before raising so no browser is left running
+            errors = [future.exception() for future in futures]
+
+        for (span_start, span_end), error in zip(spans, errors):
+            if error is not None:
+                logger.error(f"  Slice {span_start} to {span_end} failed: {str(error)}")
+        failed = next((error for error in errors if error is not None), None)
+        if failed is not None:
+            raise failed
+
+        merge_csv_files(slice_paths, final_path)
+        logger.info(f"Merged {len(spans)} slices into {final_path}")
+    finally:
+        for slice_path in slice_paths:
+            slice_path.unlink(missing_ok=True)
+
+
+def _window_file(report_path):
+    """Sidecar recording the date window a sliced download covers"""
+    return report_path.with_name(report_path.stem + ".window.json")
+
 
-            # === WAIT FOR REPORT PAGE TO LOAD ===
-            logger.info("Waiting for report data to load...")
-            page.wait_for_selector('a[href*="doCSVFile"]', timeout=60000)
+def _cached_window(report_path):
+    """
+    (start_date, end_date) held by a cached sliced download
 
-            # === DOWNLOAD CSV ===
-            logger.info("Downloading CSV...")
-            with page.expect_download() as download_info:
-                page.click('a[href*="doCSVFile"]')
+    Returns:
+        None if the file came from the saved report's own criteria
+    """
+    window_file = _window_file(report_path)
+    if not window_file.exists():
+        return None
+    window = json.loads(window_file.read_text(encoding='utf-8'))
+    return window["start_date"], window["end_date"]
+
+
+def _record_window(report_path, start_date, end_date):
+    """Remember the window of a sliced download; drop sidecars of deleted reports"""
+    for window_file in report_path.parent.glob("*.window.json"):
+        if not window_file.with_name(window_file.name.replace(".window.json", ".csv")).exists():
+            window_file.unlink(missing_ok=True)
+
+    if start_date is None:
+        _window_file(report_path).unlink(missing_ok=True)
+    else:
+        _window_file(report_path).write_text(
+            json.dumps({"start_date": start_date, "end_date": end_date}), encoding='utf-8')
+
+
+def download_report(report_id=None, browser_context=None, force=False, start_date=None, end_date=None):
+    """
+    Download report from Unanet or use existing file from today
+
+    Args:
+        report_id: Saved report to run (default: UNANET_REPORT_ID from config)
+        browser_context: Optional open Playwright context to reuse instead
+            of launching Chrome (must be used from the thread that opened it)
+        force: Download again even if today's file already exists
+        start_date: Window start for sliced downloads (default: 365 days ago)
+        end_date: Window end for sliced downloads (default: today)
+
+    With UNANET_DOWNLOAD_SLICES > 1 the window is split into that many date
+    slices, each run from the report criteria form in its own browser, and
+    the slices are merged into the same daily file. Today's file is only
+    reused if it covers the requested window; otherwise it is downloaded
+    again for the union of both windows.
+    """
+    logger = get_logger()
 
-            download = download_info.value
-            download.save_as(final_path)
-            logger.info(f"Downloaded to: {final_path}")
+    if report_id is None:
+        report_id = UNANET_REPORT_ID
 
+    # Create reports directory if it doesn't exist
+    DOWNLOAD_DIR.mkdir(exist_ok=True)
+
+    today = datetime.now().strftime("%Y-%m-%d")
+    if report_id == UNANET_REPORT_ID:
+        final_path = DOWNLOAD_DIR / f"unanet_report_{today}.csv"
+    else:
+        # Other saved reports get their own daily cache file
+        final_path = DOWNLOAD_DIR / f"unanet_report_{report_id}_{today}.csv"
+
+    now = datetime.now()
+    if start_date is None:
+        start_date = (now - timedelta(days=365)).strftime("%Y-%m-%d")
+    if end_date is None:
+        end_date = now.strftime("%Y-%m-%d")
+
+    # Check if today's report already exists (and holds the whole window)
+    cached_window = _cached_window(final_path) if final_path.exists() else None
+    if final_path.exists() and not force:
+        if cached_window is None or (cached_window[0] <= start_date and end_date <= cached_window[1]):
+            logger.info(f"Found existing report from today: {final_path}")
+            logger.info("Using existing file instead of downloading from Unanet")
+            return final_path
+
+        logger.info(f"Today's report only covers {cached_window[0]} to {cached_window[1]}; "
+                    f"downloading it again for {start_date} to {end_date} as well")
+        force = True
+
+    if cached_window is not None:
+        # Widen rather than replace, so earlier callers keep their dates
+        start_date = min(start_date, cached_window[0])
+        end_date = max(end_date, cached_window[1])
+
+    # Download from Unanet if no file exists for today
+    if force and final_path.exists():
+        logger.info("Refreshing today's report from Unanet...")
+    else:
+        logger.info("No report found for today, downloading from Unanet...")
+
+    try:
+        if UNANET_DOWNLOAD_SLICES > 1:
+            if browser_context is not None:
+                logger.info("Sliced download: each slice opens its own browser")
+            _download_sliced(report_id, final_path, start_date, end_date, UNANET_DOWNLOAD_SLICES)
+            _record_window(final_path, start_date, end_date)
+            return final_path
+
+        if browser_context is not None:
+            _download_with_context(browser_context, report_id, final_path)
+            _record_window(final_path, None, None)
+            return final_path
+
+        # Imported here so runs that reuse today's report never load Playwright
+        from playwright.sync_api import sync_playwright
+
+        with sync_playwright() as p:
+            browser, context = launch_browser(p)
+            _download_with_context(context, report_id, final_path)
             browser.close()
 
+        # The saved report's own criteria decide its dates
+        _record_window(final_path, None, None)
         return final_path
 
     except Exception as e:
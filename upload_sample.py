@@ -6,6 +6,7 @@ import csv
 import requests
 from dataverse_client import get_dataverse_token, map_csv_row_to_dataverse
 from config import DATAVERSE_URL, TABLE_NAME
+from rate_limiter import acquire
 import sys
 
 
@@ -43,11 +44,12 @@ def upload_sample_records(csv_file_path, num_records=10):
     success_count = 0
 
     for i, record in enumerate(records, 1):
-        response = requests.post(url, headers=headers, json=record)
+        acquire()
+        response = requests.post(url, headers=headers, json=record.to_dict())
 
         if response.status_code in [200, 201, 204]:
             success_count += 1
-            date_value = record.get(list(record.keys())[10], 'N/A')  # Get date field
+            date_value = record.date or 'N/A'
             print(f"  ✓ Uploaded record {i}/{len(records)} - Date: {date_value}")
         else:
             print(f"  ✗ Error uploading record {i}: {response.status_code}")